@@ -0,0 +1,12 @@
+import importlib
+
+# Une page BRVM par module : fetch(pool=None) -> (cellules, texte "Last update"),
+# parse(cells, last_update_text, as_of=None) -> DataFrame, load(df) -> WriteResult.
+# Importer le paquet (ou récupérer une page) ne charge ni Selenium, ni pandas, ni SQLAlchemy.
+PAGES = ("bond", "capitalisation", "index", "volume")
+
+
+def scraper(name):
+    if name not in PAGES:
+        raise ValueError(f"Page inconnue : {name} (pages disponibles : {', '.join(PAGES)})")
+    return importlib.import_module(f"{__name__}.{name}")
@@ -0,0 +1,101 @@
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from . import PAGES, analytics, bench, crawl, fetcher, history, poll, replay, scraper, stream
+
+
+def run_command(args):
+    from .main import REPORT_PATH, run
+
+    return 1 if run(args.pages, resume=args.resume, report_path=args.report or REPORT_PATH,
+                    with_analytics=args.analytics) else 0
+
+
+# Cellules brutes et texte "Last update" d'une page, en JSON sur la sortie standard
+def fetch_command(args):
+    cells, last_update_text = scraper(args.page).fetch()
+    json.dump({"last_update": last_update_text, "cells": cells}, sys.stdout, ensure_ascii=False)
+    print()
+    return 0
+
+
+# Parse une page HTML enregistrée et écrit le DataFrame en CSV, sans navigateur ni base ;
+# avec --chunk-rows, le fichier est lu et le CSV produit bloc par bloc
+def parse_command(args):
+    module = scraper(args.page)
+    as_of = datetime.fromisoformat(args.as_of) if args.as_of else None
+    with open(args.file, "rb") as f:
+        if args.chunk_rows:
+            last_update_text, cells = stream.read_source(module, f)
+            frames = stream.parse_chunks(module, cells, last_update_text, as_of, args.chunk_rows)
+        else:
+            doc = fetcher.parse_html(f.read().decode("utf-8"))
+            frames = [module.parse(module.CELLS(doc), fetcher.last_update_text(doc), as_of=as_of)]
+        for i, df in enumerate(frames):
+            df.to_csv(sys.stdout, index=False, header=i == 0)
+    return 0
+
+
+# Historique Parquet d'une table, filtré par dates et symboles, en CSV
+def history_command(args):
+    table = history.read(args.table, args.since, args.until, args.columns, args.symbols)
+    table.to_pandas().to_csv(sys.stdout, index=False)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scrapper", description="Scrapers des pages de marché BRVM")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="scraper les pages et les écrire en base")
+    run_parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES, help="pages à traiter (toutes par défaut)")
+    run_parser.add_argument("--resume", action="store_true",
+                            help="reprendre le dernier run interrompu (pages déjà écrites ignorées)")
+    run_parser.add_argument("--report", default=None, help="rapport JSON du run ('-' pour la sortie standard)")
+    run_parser.add_argument("--analytics", action="store_true", default=analytics.ANALYTICS,
+                            help="calculer et écrire les indicateurs (rendement, duration, parts de marché)")
+    run_parser.set_defaults(func=run_command)
+
+    fetch_parser = commands.add_parser("fetch", help="récupérer une page et afficher ses cellules en JSON")
+    fetch_parser.add_argument("page", choices=PAGES)
+    fetch_parser.set_defaults(func=fetch_command)
+
+    parse_parser = commands.add_parser("parse", help="parser une page HTML enregistrée et afficher le résultat en CSV")
+    parse_parser.add_argument("page", choices=PAGES)
+    parse_parser.add_argument("file", help="fichier HTML de la page")
+    parse_parser.add_argument("--as-of", help="date de la page quand elle n'en affiche pas (YYYY-MM-DD)")
+    parse_parser.add_argument("--chunk-rows", type=int, help="parser par blocs de N lignes (mémoire constante)")
+    parse_parser.set_defaults(func=parse_command)
+
+    replay_parser = commands.add_parser("replay", help="reparser les pages archivées, sans navigateur ni réseau")
+    replay.add_arguments(replay_parser)
+    replay_parser.set_defaults(func=replay.run)
+
+    crawl_parser = commands.add_parser("crawl", help="parcourir toutes les pages (et vues datées) d'une liste")
+    crawl.add_arguments(crawl_parser)
+    crawl_parser.set_defaults(func=crawl.run)
+
+    poll_parser = commands.add_parser("poll", help="démon : scraper à chaque changement de \"Last update\"")
+    poll.add_arguments(poll_parser)
+    poll_parser.set_defaults(func=poll.run)
+
+    history_parser = commands.add_parser("history", help="lire l'historique Parquet d'une table en CSV")
+    history_parser.add_argument("table", choices=[scraper(name).SPEC.table for name in PAGES])
+    history_parser.add_argument("--since", help="première date (YYYY-MM-DD)")
+    history_parser.add_argument("--until", help="dernière date (YYYY-MM-DD)")
+    history_parser.add_argument("--symbols", nargs="+", help="symboles (noms d'indice pour indexes)")
+    history_parser.add_argument("--columns", nargs="+", help="colonnes à lire")
+    history_parser.set_defaults(func=history_command)
+
+    bench_parser = commands.add_parser("bench", help="mesurer extract/normalize/write sur pages archivées et tables synthétiques")
+    bench.add_arguments(bench_parser)
+    bench_parser.set_defaults(func=bench.run)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,192 @@
+import os
+from datetime import date
+
+from . import db, schema
+
+# Indicateurs calculés une fois à l'ingestion, pour tous les titres d'un coup (formules vectorisées NumPy),
+# et écrits dans des tables compagnes avec les pages du run
+ANALYTICS = os.getenv("ANALYTICS", "0") != "0"
+
+# Coupons par an (BRVM : surtout annuels) ; remboursement in fine
+COUPON_FREQUENCY = int(os.getenv("COUPON_FREQUENCY", "1"))
+
+# Cours lus en % du nominal ; au-delà de PERCENT_PRICE_MAX, en FCFA pour un nominal de BOND_NOMINAL
+BOND_NOMINAL = float(os.getenv("BOND_NOMINAL", "10000"))
+PERCENT_PRICE_MAX = 200
+
+# Itérations de Newton pour le rendement actuariel, et échéancier maximal (en coupons)
+YIELD_ITERATIONS = 50
+MAX_COUPONS = 200
+
+# Base de jours ACT/365
+DAYS_PER_YEAR = 365.0
+
+BOND_SCHEMA = schema.Schema("obligations_analytics", (
+    schema.Column("bond_id", schema.TEXT, nullable=False),
+    schema.Column("symbol", schema.CATEGORY),
+    schema.Column("as_of", schema.DATE, nullable=False),
+    schema.Column("years_to_maturity", schema.FLOAT),
+    schema.Column("accrued_interest", schema.FLOAT),
+    schema.Column("dirty_price", schema.FLOAT),
+    schema.Column("yield_to_maturity", schema.FLOAT),
+    schema.Column("macaulay_duration", schema.FLOAT),
+    schema.Column("modified_duration", schema.FLOAT),
+), schema.join_key("bond_id", "as_of"))
+
+BOND_SPEC = schema.spec(BOND_SCHEMA, """
+CREATE TABLE IF NOT EXISTS obligations_analytics (
+    id TEXT PRIMARY KEY,
+    bond_id TEXT NOT NULL,
+    symbol TEXT,
+    as_of DATE NOT NULL,
+    years_to_maturity DOUBLE PRECISION,
+    accrued_interest DOUBLE PRECISION,
+    dirty_price DOUBLE PRECISION,
+    yield_to_maturity DOUBLE PRECISION,
+    macaulay_duration DOUBLE PRECISION,
+    modified_duration DOUBLE PRECISION
+);
+""")
+
+MARKET_SCHEMA = schema.Schema("market_analytics", (
+    schema.Column("symbol", schema.CATEGORY, nullable=False),
+    schema.Column("update_date", schema.DATE, nullable=False),
+    schema.Column("global_capitalization", schema.FLOAT),
+    schema.Column("traded_value", schema.FLOAT),
+    schema.Column("market_share", schema.FLOAT),
+    schema.Column("traded_value_share", schema.FLOAT),
+    schema.Column("turnover_ratio", schema.FLOAT),
+), schema.join_key("symbol", "update_date"))
+
+MARKET_SPEC = schema.spec(MARKET_SCHEMA, """
+CREATE TABLE IF NOT EXISTS market_analytics (
+    id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    update_date DATE NOT NULL,
+    global_capitalization DOUBLE PRECISION,
+    traded_value DOUBLE PRECISION,
+    market_share DOUBLE PRECISION,
+    traded_value_share DOUBLE PRECISION,
+    turnover_ratio DOUBLE PRECISION
+);
+""")
+
+
+# Dates -> nombre de jours depuis 1970 (NaN si absente ou illisible)
+def _days(values):
+    import numpy as np
+    import pandas as pd
+
+    dates = pd.to_datetime(values, errors="coerce")
+    return np.where(dates.isna(), np.nan, dates.to_numpy("datetime64[D]").astype("int64"))
+
+
+# Rendement, coupon couru et duration de chaque obligation à la date as_of (montants en % du nominal).
+# Échéancier : coupons tous les 1/COUPON_FREQUENCY an depuis le dernier paiement (ou, à défaut,
+# en remontant depuis l'échéance), nominal remboursé à l'échéance
+def bond_metrics(df, as_of=None):
+    import numpy as np
+    import pandas as pd
+
+    settle_day = pd.Timestamp(as_of or date.today()).normalize()
+    settle = float(settle_day.to_datetime64().astype("datetime64[D]").astype("int64"))
+    frequency = COUPON_FREQUENCY
+    period = DAYS_PER_YEAR / frequency
+
+    rate = df["coupon_rate"].to_numpy("float64", na_value=np.nan) / 100
+    price = df["daily_price"].to_numpy("float64", na_value=np.nan)
+    price = np.where(price > PERCENT_PRICE_MAX, 100 * price / BOND_NOMINAL, price)
+    maturity = _days(df["maturity_date"])
+    last_payment = _days(df["last_payment_date"])
+
+    # Date du coupon précédent, puis coupons restants jusqu'à l'échéance (arrondis : ACT/365 dérive
+    # d'un jour les années bissextiles)
+    remaining = (maturity - settle) / period
+    previous = np.where(
+        (last_payment <= settle) & (last_payment > settle - period),
+        last_payment,
+        maturity - np.ceil(remaining - 0.01) * period,
+    )
+    # Fraction de période jusqu'au prochain coupon (0 < w <= 1)
+    to_next = np.clip((previous + period - settle) / period, 1e-9, 1.0)
+    coupons = np.maximum(np.floor(remaining - to_next + 0.5) + 1, 1)
+    coupon = 100 * rate / frequency
+    accrued = coupon * (1 - to_next)
+    dirty = price + accrued
+
+    valid = (remaining > 0) & np.isfinite(rate) & (price > 0) & np.isfinite(to_next)
+    coupons = np.where(valid, np.minimum(coupons, MAX_COUPONS), 0).astype("int64")
+
+    # Échéancier en matrice (obligations x coupons) : exposants en périodes et flux
+    k = np.arange(max(int(coupons.max(initial=0)), 1))
+    exponents = to_next[:, None] + k[None, :]
+    flows = np.where(k[None, :] < coupons[:, None], coupon[:, None], 0.0)
+    flows[np.arange(len(flows)), np.maximum(coupons - 1, 0)] += np.where(valid, 100.0, 0.0)
+    flows = np.nan_to_num(flows)
+
+    # Newton sur le taux par période, toutes les obligations à la fois
+    with np.errstate(all="ignore"):
+        r = np.where(valid & (rate > 0), rate / frequency, 0.05)
+        for _ in range(YIELD_ITERATIONS):
+            discount = (1 + r[:, None]) ** -exponents
+            value = (flows * discount).sum(axis=1) - dirty
+            slope = -(flows * exponents * discount).sum(axis=1) / (1 + r)
+            step = np.where(valid & (slope != 0), value / slope, 0.0)
+            r = np.maximum(r - step, -0.99)
+            if np.nanmax(np.abs(step), initial=0) < 1e-12:
+                break
+        discount = (1 + r[:, None]) ** -exponents
+        present = (flows * discount).sum(axis=1)
+        macaulay = (flows * exponents * discount).sum(axis=1) / present / frequency
+
+    missing = ~valid
+    return schema.conform(pd.DataFrame({
+        "bond_id": df["id"],
+        "symbol": df["symbol"],
+        "as_of": settle_day,
+        "years_to_maturity": np.where(remaining > 0, remaining / frequency, np.nan),
+        "accrued_interest": np.where(missing, np.nan, accrued),
+        "dirty_price": np.where(missing, np.nan, dirty),
+        "yield_to_maturity": np.where(missing, np.nan, 100 * r * frequency),
+        "macaulay_duration": np.where(missing, np.nan, macaulay),
+        "modified_duration": np.where(missing, np.nan, macaulay / (1 + r)),
+    }, index=df.index), BOND_SCHEMA)
+
+
+# Part de marché, part des échanges et taux de rotation par titre et par séance
+# (capitalisation jointe aux volumes sur symbole et date)
+def market_metrics(capitalisation, volumes):
+    import numpy as np
+    import pandas as pd
+
+    # Jointure sur des clés simples (les catégories des deux tables diffèrent)
+    keys = ["symbol", "update_date"]
+    cap = capitalisation[keys + ["global_capitalization"]].astype({"symbol": object, "update_date": object})
+    traded = volumes[keys + ["traded_value"]].astype({"symbol": object, "update_date": object})
+    df = cap.drop_duplicates(keys, keep="last").merge(traded.drop_duplicates(keys, keep="last"), on=keys, how="left")
+
+    days = df.groupby("update_date")
+    total_cap = days["global_capitalization"].transform("sum").to_numpy("float64")
+    total_traded = days["traded_value"].transform("sum").to_numpy("float64")
+    cap_values = df["global_capitalization"].to_numpy("float64")
+    traded_values = df["traded_value"].to_numpy("float64")
+    with np.errstate(all="ignore"):
+        df["market_share"] = np.where(total_cap > 0, 100 * cap_values / total_cap, np.nan)
+        df["traded_value_share"] = np.where(total_traded > 0, 100 * traded_values / total_traded, np.nan)
+        df["turnover_ratio"] = np.where(cap_values > 0, 100 * traded_values / cap_values, np.nan)
+    return schema.conform(df, MARKET_SCHEMA)
+
+
+# Tables compagnes calculables à partir des DataFrames de pages disponibles : [(spec, DataFrame)]
+def compute(frames, as_of=None):
+    results = []
+    if "bond" in frames:
+        results.append((BOND_SPEC, bond_metrics(frames["bond"], as_of)))
+    if "capitalisation" in frames and "volume" in frames:
+        results.append((MARKET_SPEC, market_metrics(frames["capitalisation"], frames["volume"])))
+    return results
+
+
+def save(spec, df, **options):
+    inserted, updated, unchanged = db.upsert(db.engine(), df, spec, **options)
+    print(f"📐 {spec.table} : {inserted} insérées, {updated} mises à jour, {unchanged} inchangées")
@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+# Archive locale des pages récupérées : objets gzip adressés par SHA-256 + index JSON lines
+ARCHIVE_DIR = os.getenv("PAGE_ARCHIVE_DIR", "archive")
+ARCHIVE_PAGES = os.getenv("ARCHIVE_PAGES", "1") != "0"
+
+_index_lock = threading.Lock()
+
+
+def object_path(digest):
+    return os.path.join(ARCHIVE_DIR, "objects", digest[:2], f"{digest[2:]}.html.gz")
+
+
+def index_path():
+    return os.path.join(ARCHIVE_DIR, "index.jsonl")
+
+
+# Enregistre une page (contenu identique = un seul objet) et renvoie son empreinte
+def save_page(url, html, fetched_at=None):
+    if not ARCHIVE_PAGES:
+        return None
+    data = html.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = object_path(digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    entry = {
+        "sha256": digest,
+        "url": url,
+        "fetched_at": (fetched_at or datetime.now(timezone.utc)).isoformat(),
+    }
+    with _index_lock, open(index_path(), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+    return digest
+
+
+def load_page(digest):
+    with gzip.open(object_path(digest), "rb") as f:
+        return f.read().decode("utf-8")
+
+
+# Page archivée en flux binaire, décompressée au fil de la lecture (mode flux)
+def open_page(digest):
+    return gzip.open(object_path(digest), "rb")
+
+
+# Entrées de l'index, filtrées par URL et par date de récupération (YYYY-MM-DD, bornes incluses)
+def entries(urls=None, since=None, until=None):
+    if not os.path.exists(index_path()):
+        return
+    with open(index_path(), encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            day = entry["fetched_at"][:10]
+            if urls is not None and entry["url"] not in urls:
+                continue
+            if (since and day < since) or (until and day > until):
+                continue
+            yield entry
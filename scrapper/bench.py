@@ -0,0 +1,307 @@
+import ctypes
+import gc
+import io
+import json
+import os
+import sqlite3
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from . import PAGES, archive, db, fetcher, metrics, scraper, stream
+
+# Banc d'essai extract -> normalize -> write sur les pages de test, des tables synthétiques et, au besoin,
+# les pages archivées, sans accès à brvm.org
+BASELINE_PATH = os.getenv("BENCH_BASELINE", os.path.join("benchmarks", "baseline.json"))
+
+# Pages versionnées avec le dépôt (celles des tests hors ligne) : la référence ne dépend pas de l'archive locale
+FIXTURES_DIR = os.getenv("BENCH_FIXTURES", os.path.join("tests", "fixtures"))
+
+# Écart toléré par rapport à la référence avant de signaler une régression
+TOLERANCE = 0.2
+
+# Écart absolu toléré en plus sur la mémoire résidente (Mo)
+RSS_NOISE_MB = 5
+
+# Schéma Postgres dédié : les tables de production ne sont jamais touchées
+BENCH_SCHEMA = "brvm_bench"
+
+STAGES = ("extract", "normalize", "write", "stream")
+
+_LAST_UPDATE = "<p>Last update: Monday, 06 January, 2025 - 17:00</p>"
+
+
+def _bond_row(i):
+    year = 2015 + i % 10
+    return (f"BND.{i:07d}", f"BOND.{i:07d} {5 + i % 300 / 100:.2f}% {year}-{year + 7}",
+            f"01/15/{year}", f"01/15/{year + 7}", f"{9500 + i % 1000} 000,00", f"{i % 700 / 100:.2f}",
+            f"{1 + i % 12:02d}/15/2024 / {100 + i % 50},{i % 100:02d}")
+
+
+def _capitalisation_row(i):
+    return (f"SYM{i:07d}", f"SOCIETE {i}", f"{1 + i % 900} {i % 1000:03d} 000", f"{1000 + i % 9000} ",
+            f"{i % 500} {i % 1000:03d},50", f"{1 + i % 800} {i % 1000:03d} 000", f"{i % 1000 / 100:.2f} %")
+
+
+def _volume_row(i):
+    return (f"SYM{i:07d}", f"SOCIETE {i}", str(i % 400), f"{i % 90} {i % 1000:03d} 000",
+            "-" if i % 7 == 0 else f"{i % 30},{i % 10}", f"{i % 1000 / 100:.2f} %")
+
+
+def _index_row(i):
+    return (f"BRVM-IDX{i:07d}", f"{200 + i % 100},{i % 100:02d}", f"{201 + i % 100},{i % 100:02d}",
+            f"{i % 300 / 100:.2f} %", f"-{i % 900 / 100:.2f} %")
+
+
+_ROWS = {"bond": _bond_row, "capitalisation": _capitalisation_row, "volume": _volume_row, "index": _index_row}
+
+
+# Page HTML de même structure que celle du site (table.table), avec `rows` lignes distinctes
+def synthetic_page(name, rows):
+    body = "".join(
+        "<tr>" + "".join(f"<td>{cell}</td>" for cell in _ROWS[name](i)) + "</tr>" for i in range(rows)
+    )
+    if name == "index":
+        # Page des indices : ligne d'en-tête dans le tableau, pas de date
+        return f'<table class="table"><tr><th>Index</th></tr>{body}</table>'
+    return f'{_LAST_UPDATE}<table class="table"><thead><tr><th>-</th></tr></thead><tbody>{body}</tbody></table>'
+
+
+# Dernière version archivée de chaque page (pages réellement récupérées)
+def archived_pages(pages):
+    latest = {}
+    urls = {scraper(name).URL: name for name in pages}
+    for entry in archive.entries(set(urls)):
+        latest[urls[entry["url"]]] = entry
+    return {name: archive.load_page(entry["sha256"]) for name, entry in latest.items()}
+
+
+# Pages enregistrées dans `directory` (<page>.html) ; les pages absentes sont ignorées
+def fixture_pages(pages, directory=FIXTURES_DIR):
+    found = {}
+    for name in pages:
+        path = os.path.join(directory, f"{name}.html")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                found[name] = f.read()
+    return found
+
+
+# Cible d'écriture : Postgres local (schéma dédié) ou SQLite en mémoire
+class Target:
+    def __init__(self, database_url=None):
+        self.database_url = database_url
+        if database_url:
+            from sqlalchemy import create_engine
+
+            self.engine = create_engine(database_url, connect_args={"options": f"-csearch_path={BENCH_SCHEMA}"})
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA}")
+        else:
+            self.connection = sqlite3.connect(":memory:")
+
+    @property
+    def name(self):
+        return "postgres" if self.database_url else "sqlite"
+
+    # Table vide aux types déduits du DataFrame
+    def reset(self, spec, df):
+        columns = []
+        for sql_col, df_col in spec.columns.items():
+            kind = df[df_col].dtype.kind
+            sql_type = "BIGINT" if kind in "iu" else "DOUBLE PRECISION" if kind == "f" else "TEXT"
+            columns.append(f"{sql_col} {sql_type}" + (" PRIMARY KEY" if sql_col == spec.key else ""))
+        statements = [f"DROP TABLE IF EXISTS {spec.table}", f"CREATE TABLE {spec.table} ({', '.join(columns)})"]
+        if self.database_url:
+            statements.append(f"DELETE FROM scrape_row_hashes WHERE table_name = '{spec.table}'")
+            statements.append(f"DELETE FROM scrape_snapshots WHERE table_name = '{spec.table}'")
+            with self.engine.begin() as connection:
+                connection.exec_driver_sql(db.HASH_TABLES_DDL)
+                for statement in statements:
+                    connection.exec_driver_sql(statement)
+        else:
+            for statement in statements:
+                self.connection.execute(statement)
+
+    def write(self, spec, df, **options):
+        if self.database_url:
+            return db.upsert(self.engine, df, spec, **options)
+        # SQLite : même upsert (ON CONFLICT ... DO UPDATE), lignes envoyées par executemany
+        columns = list(spec.columns)
+        updates = ", ".join(f"{col} = excluded.{col}" for col in columns if col != spec.key)
+        query = (f"INSERT INTO {spec.table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                 f"ON CONFLICT ({spec.key}) DO UPDATE SET {updates}")
+        records = [
+            tuple(value.isoformat() if isinstance(value, (date, datetime)) else value for value in record)
+            for record in db.to_records(df, spec)
+        ]
+        with self.connection:
+            self.connection.executemany(query, records)
+        return db.WriteResult(len(records), 0, 0)
+
+
+# Mémoire résidente du processus (Ko) lue dans /proc (Linux) : VmRSS actuelle ou VmHWM (pic)
+def _status_kb(field):
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise OSError(f"{field} absent de /proc/self/status")
+
+
+# Remet le pic de mémoire résidente au niveau actuel ; renvoie ce niveau (Ko), None hors Linux.
+# La mémoire libérée par les étapes précédentes est d'abord rendue au système (glibc) : sinon une étape
+# la réutiliserait sans que le pic ne bouge
+def _reset_peak_rss():
+    gc.collect()
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return _status_kb("VmRSS")
+    except OSError:
+        return None
+
+
+# Passes : "time" (durée), "trace" (pic tracemalloc : allocations Python, pandas et numpy) et "rss"
+# (hausse du pic de mémoire résidente : compte aussi libxml2 et les autres allocations natives)
+def _measure(function, mode):
+    if mode == "trace":
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            result = function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result, None, peak / 1024 / 1024
+    if mode == "rss":
+        before = _reset_peak_rss()
+        result = function()
+        return result, None, None if before is None else (_status_kb("VmHWM") - before) / 1024
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start, None
+
+
+# Mesure les étapes d'une page : meilleur temps sur `repeat` passes, puis une passe tracemalloc et une
+# passe mémoire résidente. Avec chunk_rows, "stream" mesure tout le chemin HTML -> base par blocs de
+# chunk_rows lignes, la page étant lue par blocs d'octets comme un fichier
+def bench_page(name, html, target, repeat=3, chunk_rows=None):
+    module = scraper(name)
+    as_of = datetime(2025, 1, 6)
+    data = html.encode("utf-8")
+
+    def streamed():
+        last_update_text, cells = stream.read_source(module, io.BytesIO(data))
+        frames = stream.parse_chunks(module, cells, last_update_text, as_of, chunk_rows)
+        return sum(target.write(module.SPEC, frame, snapshot=False).inserted for frame in frames)
+
+    def extract():
+        doc = fetcher.parse_html(html)
+        return module.CELLS(doc), fetcher.last_update_text(doc)
+
+    results = {}
+    for mode in ("time",) * repeat + ("trace", "rss"):
+        (cells, last_update_text), seconds, peak = _measure(extract, mode)
+        _record(results, "extract", len(cells), seconds, peak, mode)
+        df, seconds, peak = _measure(lambda: module.parse(cells, last_update_text, as_of=as_of), mode)
+        _record(results, "normalize", len(df), seconds, peak, mode)
+        target.reset(module.SPEC, df)
+        _, seconds, peak = _measure(lambda: target.write(module.SPEC, df), mode)
+        _record(results, "write", len(df), seconds, peak, mode)
+        if chunk_rows:
+            target.reset(module.SPEC, df)
+            # Tables des étapes précédentes libérées : la passe "rss" ne mesure que le flux
+            del cells, df
+            rows, seconds, peak = _measure(streamed, mode)
+            _record(results, "stream", rows, seconds, peak, mode)
+    return results
+
+
+def _record(results, stage, rows, seconds, peak, mode):
+    result = results.setdefault(stage, {"rows": rows, "seconds": None, "rows_per_s": None, "peak_mb": None,
+                                        "rss_mb": None})
+    if seconds is not None and (result["seconds"] is None or seconds < result["seconds"]):
+        result["seconds"] = round(seconds, 4)
+        result["rows_per_s"] = round(rows / seconds) if seconds > 0 else None
+    if peak is not None:
+        result["peak_mb" if mode == "trace" else "rss_mb"] = round(peak, 2)
+
+
+# Compare au résultat de référence ; renvoie les lignes de régression
+def compare(key, result, baseline, tolerance=TOLERANCE):
+    reference = baseline.get(key)
+    if not reference:
+        return []
+    regressions = []
+    if reference.get("rows_per_s") and result["rows_per_s"] is not None \
+            and result["rows_per_s"] < reference["rows_per_s"] * (1 - tolerance):
+        regressions.append(f"débit {result['rows_per_s']} l/s < {reference['rows_per_s']} l/s")
+    if reference.get("peak_mb") and result["peak_mb"] is not None \
+            and result["peak_mb"] > reference["peak_mb"] * (1 + tolerance):
+        regressions.append(f"mémoire {result['peak_mb']} Mo > {reference['peak_mb']} Mo")
+    # Mémoire résidente : quelques Mo de bruit (allocateur) tolérés en plus pour les petites tables
+    if reference.get("rss_mb") and result.get("rss_mb") is not None \
+            and result["rss_mb"] > reference["rss_mb"] * (1 + tolerance) + RSS_NOISE_MB:
+        regressions.append(f"mémoire résidente {result['rss_mb']} Mo > {reference['rss_mb']} Mo")
+    return regressions
+
+
+def add_arguments(parser):
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES, help="pages à mesurer (toutes par défaut)")
+    parser.add_argument("--rows", nargs="*", type=int, default=[10_000, 100_000],
+                        help="tailles des tables synthétiques (ex. 10000 100000 1000000)")
+    parser.add_argument("--no-fixtures", action="store_true", help=f"ignorer les pages de {FIXTURES_DIR}")
+    parser.add_argument("--archive", action="store_true",
+                        help="mesurer aussi la dernière version archivée de chaque page (archive locale)")
+    parser.add_argument("--repeat", type=int, default=3, help="passes chronométrées (meilleur temps retenu)")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"),
+                        help=f"Postgres local (schéma {BENCH_SCHEMA}) ; SQLite en mémoire par défaut")
+    parser.add_argument("--chunk-rows", type=int, help="mesurer aussi le mode flux par blocs de N lignes")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="fichier de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistrer ce run comme référence")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="écart toléré (0.2 = 20 %%)")
+
+
+def run(args):
+    # Les écritures passent par db.upsert : pas de journal JSON par étape pendant les mesures
+    metrics.METRICS_LOG = ""
+    target = Target(args.database_url)
+    cases = []
+    if not args.no_fixtures:
+        cases += [(name, "fixture", html) for name, html in fixture_pages(args.pages).items()]
+    if args.archive:
+        cases += [(name, "archive", html) for name, html in archived_pages(args.pages).items()]
+    for rows in args.rows:
+        cases += [(name, f"synthetic-{rows}", synthetic_page(name, rows)) for name in args.pages]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"🟢 {len(cases)} cas, écriture vers {target.name}")
+    current, regressions = {}, 0
+    for name, source, html in cases:
+        for stage, result in bench_page(name, html, target, args.repeat, args.chunk_rows).items():
+            key = f"{name}:{source}:{stage}:{target.name}"
+            current[key] = result
+            problems = compare(key, result, baseline, args.tolerance)
+            regressions += bool(problems)
+            print(f"{'🔴' if problems else '✅'} {name:<15} {source:<18} {stage:<10} "
+                  f"{result['rows']:>8} l. {result['seconds']:>8.3f}s {result['rows_per_s'] or 0:>10} l/s "
+                  f"{result['peak_mb']:>8.1f} Mo {result['rss_mb'] or 0:>8.1f} Mo RSS"
+                  + (f"  ({'; '.join(problems)})" if problems else ""))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **current}, f, indent=2, sort_keys=True)
+        print(f"💾 Référence enregistrée dans {args.baseline}")
+    elif not baseline:
+        print(f"⚠️ Pas de référence ({args.baseline}) : relancer avec --save-baseline pour en créer une")
+    return 1 if regressions else 0
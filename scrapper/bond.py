@@ -1,209 +1,162 @@
-import os
 import re
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
-
-# Charger les variables d'environnement
-load_dotenv()
-
-# Configuration de la connexion à PostgreSQL
-target_postgres_engine = create_engine(
-    f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
-    f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-)
+from . import db, fetcher, schema
 
-# Configuration options Chrome pour Docker headless
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--disable-gpu")
-options.add_argument("--window-size=1920,1080")
+# URL à scraper (obligations)
+URL = "https://www.brvm.org/en/cours-obligations/0"
 
-# Définir explicitement le chemin du binaire Chromium
-options.binary_location = os.getenv('CHROME_BIN', '/usr/bin/chromium')
 
-# Chemin du chromedriver
-CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "/usr/lib/chromium/chromedriver")
+# Délai maximal de chargement de la page (secondes)
+PAGE_TIMEOUT = 10
 
-# Initialisation du driver Chrome
-driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+# Pas de date de mise à jour exigée sur la page (voir fetcher.scrape_page)
+REQUIRE_LAST_UPDATE = False
 
-# URL à scraper (obligations)
-url = "https://www.brvm.org/en/cours-obligations/0"
-driver.get(url)
 
-# Attendre que le tableau soit chargé (max 10s)
-WebDriverWait(driver, 10).until(
-    EC.presence_of_element_located((By.CSS_SELECTOR, "table.table tbody tr"))
-)
+def scrape_selenium(driver, url=URL):
+    from . import browser
+
+    # Attendre que le tableau soit chargé puis récupérer les lignes en un seul appel
+    cells, last_update_text = browser.load_table(driver, url, fetcher.budget(PAGE_TIMEOUT))
+    return cells, last_update_text or fetcher.UNKNOWN_UPDATE
 
-# Récupérer les lignes du tableau
-rows = driver.find_elements(By.CSS_SELECTOR, "table.table tbody tr")
 
 # Extraction des données
-data = []
-for row in rows:
-    cols = row.find_elements(By.TAG_NAME, "td")
-    if len(cols) >= 7:
-        symbol = cols[0].text.strip()
-        name = cols[1].text.strip()
-        issue_date = cols[2].text.strip()
-        maturity_date = cols[3].text.strip()
-        daily_price = cols[4].text.strip().replace('\xa0', ' ').replace(',', '.')
-        interest = cols[5].text.strip().replace('\xa0', ' ').replace(',', '.')
-        last_payment = cols[6].text.strip()
-        data.append([symbol, name, issue_date, maturity_date, daily_price, interest, last_payment])
-
-driver.quit()
-
-df = pd.DataFrame(data, columns=[
-    "SYMBOL", "NAME", "ISSUE_DATE", "MATURITY_DATE", "DAILY_PRICE", "INTEREST", "LAST_PAYMENT_DATE_VALUE"
-])
-
-# Nettoyage des colonnes numériques
-for col in ["DAILY_PRICE", "INTEREST"]:
-    df[col] = df[col].str.replace(' ', '').astype(float)
-
-# Extraction détails obligations
-def extract_bond_details(name):
-    try:
-        match = re.search(r'^(.*?)\s+(\d+[,.]\d+)%\s+(\d{4})-(\d{4})$', str(name))
-        if match:
-            return pd.Series({
-                'BOND_TYPE': match.group(1).strip(),
-                'COUPON_RATE': float(match.group(2).replace(',', '.')),
-                'ISSUE_YEAR': int(match.group(3)),
-                'MATURITY_YEAR': int(match.group(4))
-            })
-        alt_match = re.search(r'^(.*?)\s+(\d+[,.]\d+)%\s+(\d{4})\s*-\s*(\d{4})$', str(name))
-        if alt_match:
-            return pd.Series({
-                'BOND_TYPE': alt_match.group(1).strip(),
-                'COUPON_RATE': float(alt_match.group(2).replace(',', '.')),
-                'ISSUE_YEAR': int(alt_match.group(3)),
-                'MATURITY_YEAR': int(alt_match.group(4))
-            })
-    except:
-        pass
-    return pd.Series({'BOND_TYPE': None, 'COUPON_RATE': None, 'ISSUE_YEAR': None, 'MATURITY_YEAR': None})
-
-bond_details = df['NAME'].apply(extract_bond_details)
-df = pd.concat([df, bond_details], axis=1)
-
-df['ISSUE_YEAR'] = df['ISSUE_YEAR'].astype('Int64')
-df['MATURITY_YEAR'] = df['MATURITY_YEAR'].astype('Int64')
-
-# Extraction détails paiement
-def extract_payment_details(payment_str):
-    try:
-        if pd.isna(payment_str):
-            return pd.Series({'LAST_PAYMENT_DATE_ONLY': None, 'LAST_PAYMENT_VALUE': None})
-        parts = payment_str.split(' / ')
-        value = float(parts[1].replace(',', '.').strip()) if len(parts) > 1 and parts[1].strip() else None
-        return pd.Series({
-            'LAST_PAYMENT_DATE_ONLY': pd.to_datetime(parts[0].strip(), format='%m/%d/%Y', errors='coerce'),
-            'LAST_PAYMENT_VALUE': value
-        })
-    except:
-        return pd.Series({'LAST_PAYMENT_DATE_ONLY': None, 'LAST_PAYMENT_VALUE': None})
-
-payment_details = df['LAST_PAYMENT_DATE_VALUE'].apply(extract_payment_details)
-df = pd.concat([df, payment_details], axis=1)
-
-df = (df
-        .drop(columns=['MATURITY_DATE', 'LAST_PAYMENT_DATE_VALUE'])
-        .rename(columns={
-            'MATURITY_YEAR': 'MATURITY_DATE',
-            'LAST_PAYMENT_DATE_ONLY': 'LAST_PAYMENT_DATE',
-            'LAST_PAYMENT_VALUE': 'VALUE'
-        }))
-
-# Création ID unique obligation
-def create_bond_id(row):
-    try:
-        bond_type = str(row['BOND_TYPE']).replace(' ', '')
-        payment_date = str(row['LAST_PAYMENT_DATE']).replace(' ', '')
-        return f"{bond_type}-{payment_date}"
-    except:
-        return None
-
-df['ID'] = df.apply(create_bond_id, axis=1)
-
-def clean_data(value):
-    return None if pd.isna(value) else value
-
-df = df.rename(columns={
-    'SYMBOL': 'symbol',
-    'NAME': 'name',
-    'ISSUE_DATE': 'issue_date',
-    'DAILY_PRICE': 'daily_price',
-    'INTEREST': 'interest',
-    'LAST_PAYMENT_DATE': 'last_payment_date',
-    'VALUE': 'value'
-})
-
-date_cols = ['issue_date', 'maturity_date', 'last_payment_date']
-for col in date_cols:
-    df[col] = pd.to_datetime(df[col], errors='coerce')
-    df[col] = df[col].dt.strftime('%Y-%m-%d').replace('NaT', None)
-
-numeric_cols = ['daily_price', 'interest', 'value', 'coupon_rate']
-for col in numeric_cols:
-    if col in df.columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-        df[col] = df[col].apply(clean_data)
-
-if 'ISSUE_YEAR' in df.columns:
-    df['ISSUE_YEAR'] = df['ISSUE_YEAR'].astype('Int64').astype(object).where(df['ISSUE_YEAR'].notna(), None)
-
-# Requête d'insertion PostgreSQL avec gestion des conflits (upsert)
-insert_query = """
-INSERT INTO obligations (
-    id, symbol, name, issue_date, maturity_date, 
-    daily_price, interest, last_payment_date, value,
-    coupon_rate, issue_year, bond_type
-) VALUES (
-    :id, :symbol, :name, :issue_date, :maturity_date,
-    :daily_price, :interest, :last_payment_date, :value,
-    :coupon_rate, :issue_year, :bond_type
+def parse_rows(cells):
+    # Lignes complètes uniquement ; le texte brut est normalisé colonne par colonne dans transform
+    return [cols[:7] for cols in cells if len(cols) >= 7]
+
+
+# Extraction des cellules depuis le HTML (pages en direct ou archivées)
+CELLS = fetcher.body_cells
+STREAM_CELLS = fetcher.stream_body_cells
+
+
+# Récupération seule (HTTP, Selenium en secours) : aucun import de pandas ni accès à la base
+def fetch(pool=None):
+    return fetcher.scrape_page(URL, pool, scrape_selenium, extract=CELLS,
+                               require_last_update=REQUIRE_LAST_UPDATE)
+
+
+# Motifs et formats précompilés : "<type> <taux>% <année émission>-<année échéance>"
+BOND_NAME_PATTERN = re.compile(
+    r'^(?P<BOND_TYPE>.*?)\s+(?P<COUPON_RATE>\d+[,.]\d+)%\s+(?P<ISSUE_YEAR>\d{4})\s*-\s*(?P<MATURITY_YEAR>\d{4})$'
 )
-ON CONFLICT (id) DO UPDATE SET
-    symbol = EXCLUDED.symbol,
-    name = EXCLUDED.name,
-    issue_date = EXCLUDED.issue_date,
-    maturity_date = EXCLUDED.maturity_date,
-    daily_price = EXCLUDED.daily_price,
-    interest = EXCLUDED.interest,
-    last_payment_date = EXCLUDED.last_payment_date,
-    value = EXCLUDED.value,
-    coupon_rate = EXCLUDED.coupon_rate,
-    issue_year = EXCLUDED.issue_year,
-    bond_type = EXCLUDED.bond_type
-"""
-
-# Insertion des données dans la base
-with target_postgres_engine.begin() as connection:
-    for _, row in df.iterrows():
-        params = {
-            'id': clean_data(row['ID']),
-            'symbol': clean_data(row['symbol']),
-            'name': clean_data(row['name']),
-            'issue_date': clean_data(row['issue_date']),
-            'maturity_date': clean_data(row['maturity_date']),
-            'daily_price': clean_data(row['daily_price']),
-            'interest': clean_data(row['interest']),
-            'last_payment_date': clean_data(row['last_payment_date']),
-            'value': clean_data(row['value']),
-            'coupon_rate': clean_data(row['COUPON_RATE']),
-            'issue_year': clean_data(row['ISSUE_YEAR']),
-            'bond_type': clean_data(row['BOND_TYPE'])
-        }
-        connection.execute(text(insert_query), params)
+PAYMENT_SEPARATOR = ' / '
+DATE_FORMAT = '%m/%d/%Y'
+
+
+# Dates au format explicite ; les valeurs dans un autre format passent par l'inférence de pandas
+def parse_dates(values, date_format=DATE_FORMAT):
+    import pandas as pd
+
+    values = values.str.strip()
+    dates = pd.to_datetime(values, format=date_format, errors='coerce')
+    other_format = dates.isna() & values.fillna('').ne('')
+    if other_format.any():
+        dates[other_format] = pd.to_datetime(values[other_format], errors='coerce')
+    return dates
+
+
+# Extraction détails obligations (colonnes entières, sans apply ligne à ligne)
+def extract_bond_details(names):
+    import pandas as pd
+    from . import normalize
+
+    details = names.astype(str).str.extract(BOND_NAME_PATTERN)
+    return pd.DataFrame({
+        'bond_type': details['BOND_TYPE'].str.strip(),
+        'coupon_rate': normalize.to_number(details['COUPON_RATE'], name='COUPON_RATE'),
+        'issue_year': pd.to_numeric(details['ISSUE_YEAR']).astype('Int64'),
+        'maturity_year': pd.to_numeric(details['MATURITY_YEAR']).astype('Int64')
+    }, index=names.index)
+
+
+# Extraction détails paiement : "<date> / <montant>"
+def extract_payment_details(payments):
+    import pandas as pd
+    from . import normalize
+
+    parts = payments.str.split(PAYMENT_SEPARATOR, n=2, expand=True).reindex(columns=[0, 1]).astype(object)
+    raw_value = parts[1].str.strip()
+    has_value = raw_value.fillna('').ne('')
+    value = normalize.to_number(raw_value.where(has_value), name='VALUE')
+    dates = pd.to_datetime(parts[0].str.strip(), format=DATE_FORMAT, errors='coerce')
+    # Montant illisible : la ligne de paiement entière est ignorée
+    dates[has_value & value.isna()] = pd.NaT
+    return pd.DataFrame({'last_payment_date': dates, 'value': value}, index=payments.index)
+
+
+# Création ID unique obligation : "<type sans espaces>-<date du dernier paiement>"
+def create_bond_id(df):
+    import pandas as pd
+
+    bond_type = df['bond_type'].astype('string').str.replace(' ', '').fillna('None')
+    payment_date = pd.to_datetime(df['last_payment_date']).dt.strftime('%Y-%m-%d%H:%M:%S').fillna('NaT')
+    return bond_type + '-' + payment_date
+
+
+# Table obligations : colonnes et types (l'année d'échéance, lue dans le nom, n'est pas stockée)
+SCHEMA = schema.Schema("obligations", (
+    schema.Column("symbol", schema.CATEGORY),
+    schema.Column("name", schema.CATEGORY),
+    schema.Column("issue_date", schema.DATE),
+    schema.Column("maturity_date", schema.DATE),
+    schema.Column("daily_price", schema.FLOAT),
+    schema.Column("interest", schema.FLOAT),
+    schema.Column("last_payment_date", schema.DATE),
+    schema.Column("value", schema.FLOAT),
+    schema.Column("coupon_rate", schema.FLOAT),
+    schema.Column("issue_year", schema.INT),
+    schema.Column("bond_type", schema.CATEGORY),
+), create_bond_id, entity=("symbol",))
+
+SPEC = schema.spec(SCHEMA)
+
+
+def transform(data):
+    import pandas as pd
+    from . import normalize
+
+    raw = pd.DataFrame(data, columns=[
+        "symbol", "name", "issue_date", "maturity_date", "daily_price", "interest", "last_payment"
+    ])
+    details = extract_bond_details(raw['name'])
+    payments = extract_payment_details(raw['last_payment'])
+
+    # Table assemblée en une seule fois, colonnes nommées comme dans la table
+    return schema.conform(pd.DataFrame({
+        'symbol': raw['symbol'],
+        'name': raw['name'],
+        'issue_date': parse_dates(raw['issue_date']),
+        'maturity_date': parse_dates(raw['maturity_date']),
+        'daily_price': normalize.to_number(raw['daily_price'], name='DAILY_PRICE'),
+        'interest': normalize.to_number(raw['interest'], name='INTEREST'),
+        'last_payment_date': payments['last_payment_date'],
+        'value': payments['value'],
+        'coupon_rate': details['coupon_rate'],
+        'issue_year': details['issue_year'],
+        'bond_type': details['bond_type'],
+    }), SCHEMA)
+
+
+def load(df, **options):
+    # Insertion des données dans la base
+    return db.upsert(db.engine(), df, SPEC, **options)
+
+
+# Cellules brutes -> DataFrame prêt à écrire ; as_of ne sert pas ici (pas de date de page)
+def parse(cells, last_update_text, as_of=None):
+    return transform(parse_rows(cells))
+
+
+def extract(pool=None):
+    return parse(*fetch(pool))
+
+
+def save(df):
+    inserted, updated, unchanged = load(df)
+    print(f"✅ Obligations : {inserted} insérées, {updated} mises à jour, {unchanged} inchangées")
+
+
+def run(pool=None):
+    save(extract(pool))
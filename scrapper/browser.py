@@ -0,0 +1,195 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from . import metrics
+
+# Chemin du chromedriver
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "/usr/lib/chromium/chromedriver")
+
+# Le tableau est prêt quand son nombre de lignes ne bouge plus pendant READY_SETTLE secondes
+READY_SETTLE = float(os.getenv("READY_SETTLE", "0.5"))
+READY_POLL = 0.25
+
+
+# Configuration options Chrome pour Docker headless ; profile_dir : profil dédié (un par processus isolé)
+def build_options(profile_dir=None):
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    options.binary_location = os.getenv('CHROME_BIN', '/usr/bin/chromium')
+    return options
+
+
+# Extraction de tout le tableau en un seul aller-retour WebDriver :
+# renvoie [lignes de cellules, texte "Last update" ou null]
+TABLE_SCRIPT = """
+var skipHeader = arguments[0];
+var rows = [];
+if (skipHeader) {
+    document.querySelectorAll('table.table').forEach(function (table) {
+        rows = rows.concat(Array.prototype.slice.call(table.querySelectorAll('tr'), 1));
+    });
+} else {
+    rows = Array.prototype.slice.call(document.querySelectorAll('table.table tbody tr'));
+}
+var cells = rows.map(function (row) {
+    return Array.prototype.map.call(row.querySelectorAll('td'), function (td) {
+        return td.innerText.trim();
+    });
+});
+var lastUpdate = document.evaluate(
+    "//*[contains(text(),'Last update')]", document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+return [cells, lastUpdate ? lastUpdate.innerText.trim() : null];
+"""
+
+
+# Sonde légère : [nombre de lignes, présence du texte "Last update"]
+READY_SCRIPT = """
+var skipHeader = arguments[0];
+var count = skipHeader
+    ? document.querySelectorAll('table.table tr').length - document.querySelectorAll('table.table').length
+    : document.querySelectorAll('table.table tbody tr').length;
+var lastUpdate = document.evaluate(
+    "count(//*[contains(text(),'Last update')])", document, null, XPathResult.NUMBER_TYPE, null
+).numberValue > 0;
+return [Math.max(count, 0), lastUpdate];
+"""
+
+
+def extract_table(driver, skip_header=False):
+    cells, last_update_text = driver.execute_script(TABLE_SCRIPT, skip_header)
+    return cells, last_update_text
+
+
+# Attend que le tableau soit stable (et "Last update" présent si demandé) ; renvoie l'attente en secondes
+def wait_until_ready(driver, timeout, skip_header=False, require_last_update=False):
+    start = time.monotonic()
+    last_count, stable_since = -1, start
+    while True:
+        count, has_last_update = driver.execute_script(READY_SCRIPT, skip_header)
+        now = time.monotonic()
+        if count != last_count:
+            last_count, stable_since = count, now
+        elif count > 0 and (has_last_update or not require_last_update) and now - stable_since >= READY_SETTLE:
+            return now - start
+        if now - start >= timeout:
+            raise TimeoutException(
+                f"Page non prête après {timeout:.1f}s "
+                f"({count} lignes, 'Last update' {'présent' if has_last_update else 'absent'})"
+            )
+        time.sleep(READY_POLL)
+
+
+# Charge une page, attend qu'elle soit prête dans le délai imparti, puis lit le tableau
+def load_table(driver, url, timeout, skip_header=False, require_last_update=False):
+    start = time.monotonic()
+    driver.set_page_load_timeout(timeout)
+    with metrics.stage("fetch"):
+        driver.get(url)
+    remaining = max(timeout - (time.monotonic() - start), 0)
+    with metrics.stage("wait"):
+        wait_until_ready(driver, remaining, skip_header, require_last_update)
+    with metrics.stage("extract") as stage:
+        cells, last_update_text = extract_table(driver, skip_header)
+        stage["rows"] = len(cells)
+    print(f"⏱️ {url} prêt en {time.monotonic() - start:.2f}s ({len(cells)} lignes)")
+    return cells, last_update_text
+
+
+def create_driver(profile_dir=None):
+    return webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=build_options(profile_dir))
+
+
+class BrowserPool:
+    """Petit pool de drivers Chrome réutilisables, un onglet par page scrapée."""
+
+    def __init__(self, size=1):
+        self.size = max(1, int(size))
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                if len(self._drivers) < self.size:
+                    with metrics.stage("startup"):
+                        driver = create_driver()
+                    self._drivers.append(driver)
+                    return driver
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    def discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    @contextmanager
+    def tab(self):
+        # Ouvre un nouvel onglet sur un driver du pool et le referme ensuite
+        driver = self.acquire()
+        try:
+            base_handle = driver.window_handles[0]
+            driver.switch_to.new_window('tab')
+        except WebDriverException:
+            self.discard(driver)
+            raise
+        try:
+            yield driver
+        finally:
+            try:
+                driver.close()
+                driver.switch_to.window(base_handle)
+            except WebDriverException:
+                # Driver planté : on le remplace au prochain acquire
+                self.discard(driver)
+            else:
+                self.release(driver)
+
+    # Même interface que workers.WorkerPool : (résultat de function(driver, url), HTML rendu).
+    # Le délai est celui de la page (pas de chien de garde dans ce processus)
+    def scrape(self, url, function, timeout=None):
+        with self.tab() as driver:
+            return function(driver, url), driver.page_source
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,145 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# Cache des pages récupérées, par URL : mémoire (LRU) puis disque. Une copie plus récente que
+# FETCH_CACHE_TTL secondes est réutilisée telle quelle ; au-delà, elle est revalidée par requête
+# conditionnelle (ETag / Last-Modified) et resservie si la page n'a pas changé (304)
+FETCH_CACHE = os.getenv("FETCH_CACHE", "1") != "0"
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", "300"))
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", ".fetch_cache")
+
+# Limites : nombre de pages et taille totale en mémoire, taille du répertoire sur disque
+FETCH_CACHE_ENTRIES = int(os.getenv("FETCH_CACHE_ENTRIES", "32"))
+FETCH_CACHE_MEMORY_MB = float(os.getenv("FETCH_CACHE_MEMORY_MB", "64"))
+FETCH_CACHE_DISK_MB = float(os.getenv("FETCH_CACHE_DISK_MB", "256"))
+
+# Page en cache ; source "http" (avec validateurs) ou "selenium" (page rendue, sans validateurs).
+# archived=False : page lue sans être archivée (marqueur du démon de poll), archivée si un scraper la réutilise
+CachedPage = namedtuple("CachedPage", ["url", "html", "fetched_at", "etag", "last_modified", "source", "archived"],
+                        defaults=[True])
+
+_memory = OrderedDict()
+_memory_size = 0
+_lock = threading.Lock()
+
+# Copies récupérées avant cet instant considérées comme périmées (voir expire)
+_expired_before = 0.0
+
+
+def _path(url):
+    return os.path.join(FETCH_CACHE_DIR, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json.gz")
+
+
+def fresh(page):
+    return page.fetched_at > _expired_before and time.time() - page.fetched_at < FETCH_CACHE_TTL
+
+
+# En-têtes de requête conditionnelle pour revalider une copie
+def validators(page):
+    if page is None:
+        return {}
+    headers = {"If-None-Match": page.etag, "If-Modified-Since": page.last_modified}
+    return {name: value for name, value in headers.items() if value}
+
+
+def _remember(page):
+    global _memory_size
+    previous = _memory.pop(page.url, None)
+    if previous is not None:
+        _memory_size -= len(previous.html)
+    _memory[page.url] = page
+    _memory_size += len(page.html)
+    while _memory and (len(_memory) > FETCH_CACHE_ENTRIES or _memory_size > FETCH_CACHE_MEMORY_MB * 1024 * 1024):
+        _, evicted = _memory.popitem(last=False)
+        _memory_size -= len(evicted.html)
+
+
+def get(url):
+    if not FETCH_CACHE:
+        return None
+    with _lock:
+        page = _memory.get(url)
+        if page is not None:
+            _memory.move_to_end(url)
+            return page
+    try:
+        with gzip.open(_path(url), "rt", encoding="utf-8") as f:
+            page = CachedPage(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+    with _lock:
+        _remember(page)
+    return page
+
+
+def _write_disk(page):
+    path = _path(page.url)
+    os.makedirs(FETCH_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(page._asdict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    # Répertoire borné : les copies les moins récemment écrites partent en premier
+    files = [entry for entry in os.scandir(FETCH_CACHE_DIR) if entry.name.endswith(".json.gz")]
+    total = sum(entry.stat().st_size for entry in files)
+    for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+        if total <= FETCH_CACHE_DISK_MB * 1024 * 1024:
+            break
+        total -= entry.stat().st_size
+        os.remove(entry.path)
+
+
+def _store(page):
+    with _lock:
+        _remember(page)
+    try:
+        _write_disk(page)
+    except OSError as e:
+        print(f"⚠️ Cache disque indisponible pour {page.url} ({e})")
+    return page
+
+
+# Enregistre une page ; headers = en-têtes de la réponse HTTP (validateurs), absents pour Selenium
+def put(url, html, headers=None, source="http", archived=True):
+    if not FETCH_CACHE:
+        return None
+    headers = headers or {}
+    return _store(CachedPage(url, html, time.time(), headers.get("ETag"), headers.get("Last-Modified"), source,
+                             archived))
+
+
+# Copie revalidée (304) : de nouveau fraîche pour FETCH_CACHE_TTL
+def touch(page):
+    return put(page.url, page.html, {"ETag": page.etag, "Last-Modified": page.last_modified}, page.source,
+               page.archived)
+
+
+# La copie en cache d'une URL vient d'être archivée (sans changer sa fraîcheur)
+def mark_archived(url):
+    page = get(url)
+    if page is not None and not page.archived:
+        _store(page._replace(archived=True))
+
+
+# Rend périmées les copies récupérées avant `before` (maintenant par défaut) ; elles restent revalidables.
+# Ex. quand le site annonce une mise à jour : seules les pages relues depuis restent fraîches
+def expire(before=None):
+    global _expired_before
+    _expired_before = time.time() if before is None else before
+
+
+def clear():
+    global _memory_size
+    with _lock:
+        _memory.clear()
+        _memory_size = 0
+    if os.path.isdir(FETCH_CACHE_DIR):
+        for entry in os.scandir(FETCH_CACHE_DIR):
+            if entry.name.endswith(".json.gz"):
+                os.remove(entry.path)
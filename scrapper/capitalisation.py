@@ -1,149 +1,110 @@
-import os
 import re
-import time
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import OperationalError
-from dotenv import load_dotenv
-import os
-# Charger les variables d'environnement
-load_dotenv()
-
-# Créer l'engine pour la base PostgreSQL
-target_postgres_engine = create_engine(
-    f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
-    f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-)
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-
-CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "/usr/lib/chromium/chromedriver")
-
-driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+from . import db, fetcher, schema
 
 # Scrape URL
-url = "https://www.brvm.org/en/capitalisations/0"
-driver.get(url)
-time.sleep(7)
-
-# Try to extract the last update date
-try:
-    last_update_elem = driver.find_element(By.XPATH, "//*[contains(text(),'Last update')]")
-    last_update_text = last_update_elem.text.strip()
-except:
-    last_update_text = "Unknown update date"
-
-# Use regex to extract date
-update_date = None
-match = re.search(r"Last update:\s*(.*)", last_update_text)
-if match:
-    update_date = match.group(1)
-
-# Table extraction
-rows = driver.find_elements(By.CSS_SELECTOR, "table.table tbody tr")
-print(f"Found {len(rows)} rows")
-
-data = []
-for row in rows:
-    cols = row.find_elements(By.TAG_NAME, "td")
-    if len(cols) >= 7:
-        symbol = cols[0].text.strip()
-        name = cols[1].text.strip()
-        number_of_shares = cols[2].text.strip().replace('\xa0', '').replace(' ', '')
-        daily_price = cols[3].text.strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
-        floating_cap = cols[4].text.strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
-        global_cap = cols[5].text.strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
-        global_cap_pct = cols[6].text.strip().replace('%', '').replace(',', '.')
-        data.append([
-            symbol, name, number_of_shares, daily_price,
-            floating_cap, global_cap, global_cap_pct
-        ])
-
-driver.quit()
-
-# Convert to DataFrame
-df = pd.DataFrame(data, columns=[
-    "SYMBOL", "NAME", "NUMBER_OF_SHARES", "DAILY_PRICE",
-    "FLOATING_CAPITALIZATION", "GLOBAL_CAPITALIZATION", "GLOBAL_CAPITALIZATION_PERCENT"
-])
-
-# Convert numeric fields
-for col in ["NUMBER_OF_SHARES", "DAILY_PRICE", "FLOATING_CAPITALIZATION", "GLOBAL_CAPITALIZATION", "GLOBAL_CAPITALIZATION_PERCENT"]:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-# Process UPDATE_DATE
-df["UPDATE_DATE"] = pd.to_datetime(update_date, errors='coerce')
-if df["UPDATE_DATE"].isnull().all():
-    df["UPDATE_DATE"] = pd.Timestamp.today().normalize()
-else:
-    df["UPDATE_DATE"] = df["UPDATE_DATE"].fillna(df["UPDATE_DATE"].mode()[0])
-
-df["UPDATE_DATE"] = df["UPDATE_DATE"].dt.strftime('%Y-%m-%d')
-df["ID"] = df["SYMBOL"] + "-" + df["UPDATE_DATE"].str.replace(" ", "")
-df = df.rename(columns={"GLOBAL_CAPITALIZATION_PERCENT": "GLOBAL_CAPITALIZATION_PER"})
-
-# Connect to DB
-engine = create_engine(
-    f"postgresql://{target_db_params_postgres['user']}:{target_db_params_postgres['password']}@"
-    f"{target_db_params_postgres['host']}:{target_db_params_postgres['port']}/"
-    f"{target_db_params_postgres['database']}",
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    pool_recycle=3600
-)
-
-# Insert in batches
-def batch_insert(df, batch_size=1000, max_retries=3):
-    insert_query = text("""
-        INSERT INTO capitalisation (
-            id, symbol, name, number_of_shares, daily_price,
-            floating_capitalization, global_capitalization,
-            global_capitalization_per, update_date
-        ) VALUES (
-            :id, :symbol, :name, :number_of_shares, :daily_price,
-            :floating_capitalization, :global_capitalization,
-            :global_capitalization_per, :update_date
-        )
-        ON CONFLICT (id) DO UPDATE SET
-            symbol = EXCLUDED.symbol,
-            name = EXCLUDED.name,
-            number_of_shares = EXCLUDED.number_of_shares,
-            daily_price = EXCLUDED.daily_price,
-            floating_capitalization = EXCLUDED.floating_capitalization,
-            global_capitalization = EXCLUDED.global_capitalization,
-            global_capitalization_per = EXCLUDED.global_capitalization_per,
-            update_date = EXCLUDED.update_date
-    """)
-    with engine.begin() as connection:
-        for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i+batch_size]
-            for retry in range(max_retries):
-                try:
-                    for _, row in batch.iterrows():
-                        connection.execute(insert_query, {
-                            'id': row['ID'],
-                            'symbol': row['SYMBOL'],
-                            'name': row['NAME'],
-                            'number_of_shares': row['NUMBER_OF_SHARES'],
-                            'daily_price': row['DAILY_PRICE'],
-                            'floating_capitalization': row['FLOATING_CAPITALIZATION'],
-                            'global_capitalization': row['GLOBAL_CAPITALIZATION'],
-                            'global_capitalization_per': row['GLOBAL_CAPITALIZATION_PER'],
-                            'update_date': row['UPDATE_DATE']
-                        })
-                    break
-                except OperationalError:
-                    if retry == max_retries - 1:
-                        raise
-                    time.sleep(2 ** retry)
-
-# Run the batch insert
-batch_insert(df)
-print("✅ Data inserted/updated successfully")
+URL = "https://www.brvm.org/en/capitalisations/0"
+
+
+# Maximum time for the page to load and settle (seconds)
+PAGE_TIMEOUT = 20
+
+# The last update date must be on the page (see fetcher.scrape_page)
+REQUIRE_LAST_UPDATE = True
+
+
+def scrape_selenium(driver, url=URL):
+    from . import browser
+
+    # Wait for a stable table and the last update date, then read both in a single call
+    cells, last_update_text = browser.load_table(
+        driver, url, fetcher.budget(PAGE_TIMEOUT), require_last_update=REQUIRE_LAST_UPDATE
+    )
+    return cells, last_update_text or fetcher.UNKNOWN_UPDATE
+
+
+def parse_update_date(last_update_text):
+    # Use regex to extract date
+    match = re.search(r"Last update:\s*(.*)", last_update_text)
+    if match:
+        return match.group(1)
+    return None
+
+
+def parse_rows(cells):
+    # Complete rows only; numbers are cleaned column by column in transform
+    return [cols[:7] for cols in cells if len(cols) >= 7]
+
+
+# Cell extraction from HTML (live or archived pages)
+CELLS = fetcher.body_cells
+STREAM_CELLS = fetcher.stream_body_cells
+
+
+def fetch(pool=None):
+    # Fetch only (HTTP, Selenium fallback): no pandas import, no database access
+    return fetcher.scrape_page(URL, pool, scrape_selenium, extract=CELLS,
+                               require_last_update=REQUIRE_LAST_UPDATE)
+
+
+# Target table: columns and types, key "<symbol>-<update_date>"
+SCHEMA = schema.Schema("capitalisation", (
+    schema.Column("symbol", schema.CATEGORY, nullable=False),
+    schema.Column("name", schema.CATEGORY),
+    schema.Column("number_of_shares", schema.INT),
+    schema.Column("daily_price", schema.FLOAT),
+    schema.Column("floating_capitalization", schema.FLOAT),
+    schema.Column("global_capitalization", schema.FLOAT),
+    schema.Column("global_capitalization_per", schema.FLOAT),
+    schema.Column("update_date", schema.DATE, nullable=False),
+), schema.join_key("symbol", "update_date"), entity=("symbol",))
+
+SPEC = schema.spec(SCHEMA)
+
+
+def transform(data, update_date, as_of=None):
+    import pandas as pd
+    from . import normalize
+
+    # Columns named as in the table from the start
+    df = pd.DataFrame(data, columns=[
+        "symbol", "name", "number_of_shares", "daily_price",
+        "floating_capitalization", "global_capitalization", "global_capitalization_per"
+    ])
+
+    # Convert numeric fields
+    df = normalize.numeric_columns(df, {
+        "number_of_shares": "Int64",
+        "daily_price": "float64",
+        "floating_capitalization": "float64",
+        "global_capitalization": "float64",
+        "global_capitalization_per": "float64"
+    })
+
+    # Page date, or as_of (default today) when it cannot be read
+    date = pd.to_datetime(update_date, errors='coerce')
+    df["update_date"] = pd.Timestamp(as_of or pd.Timestamp.today()).normalize() if pd.isna(date) else date
+    return schema.conform(df, SCHEMA)
+
+
+def load(df, **options):
+    return db.upsert(db.engine(), df, SPEC, **options)
+
+
+# Raw cells -> DataFrame ready to load; as_of replaces "today" when the page has no date
+def parse(cells, last_update_text, as_of=None):
+    return transform(parse_rows(cells), parse_update_date(last_update_text), as_of)
+
+
+def extract(pool=None):
+    cells, last_update_text = fetch(pool)
+    print(f"Found {len(cells)} rows")
+    return parse(cells, last_update_text)
+
+
+def save(df):
+    inserted, updated, unchanged = load(df)
+    print(f"✅ Data inserted/updated successfully ({inserted} inserted, {updated} updated, {unchanged} unchanged)")
+
+
+def run(pool=None):
+    save(extract(pool))
@@ -0,0 +1,164 @@
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from lxml import etree
+
+from . import PAGES, fetcher, metrics, scraper
+from .workers import browser_pool
+
+# Crawl de toutes les pages d'une liste (pager ?page=N) et des vues datées, pour les rattrapages
+
+# Pages téléchargées et parsées en parallèle (la politesse par hôte s'applique toujours)
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+
+# Lignes accumulées avant chaque écriture en base
+CRAWL_BATCH_ROWS = int(os.getenv("CRAWL_BATCH_ROWS", "5000"))
+
+# Liens du pager (Drupal : ?page=0 pour la première page)
+_PAGER_LINKS = etree.XPath("//a[contains(@href, 'page=')]/@href")
+_PAGE_NUMBER = re.compile(r"[?&]page=(\d+)")
+
+
+# Nombre de pages annoncé par le pager (1 sans pager)
+def page_count(doc):
+    numbers = [int(match.group(1)) for href in _PAGER_LINKS(doc) for match in [_PAGE_NUMBER.search(href)] if match]
+    return max(numbers, default=0) + 1
+
+
+def page_url(url, number):
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "page"]
+    if number:
+        query.append(("page", str(number)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+# Jours ouvrés entre deux dates incluses
+def weekdays(since, until):
+    day, last = date.fromisoformat(since), date.fromisoformat(until)
+    while day <= last:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+# Récupère une page : (cellules, texte "Last update", nombre de pages du pager)
+def fetch_page(module, url, pool):
+    counts = []
+
+    def extract(doc):
+        counts.append(page_count(doc))
+        return module.CELLS(doc)
+
+    cells, last_update_text = fetcher.scrape_page(url, pool, module.scrape_selenium, extract=extract,
+                                                  require_last_update=module.REQUIRE_LAST_UPDATE)
+    # Page lue par Selenium : pas de pager disponible, on s'en tient à la première page
+    return cells, last_update_text, counts[-1] if counts else 1
+
+
+def parse_page(module, url, pool, as_of):
+    cells, last_update_text, pages = fetch_page(module, url, pool)
+    return module.parse(cells, last_update_text, as_of=as_of), pages
+
+
+# Regroupe les lignes reçues, écarte les ID déjà vus et écrit par lots
+class BulkWriter:
+    def __init__(self, module, batch_rows=CRAWL_BATCH_ROWS, dry_run=False):
+        self.module = module
+        self.key = module.SPEC.columns[module.SPEC.key]
+        self.batch_rows = batch_rows
+        self.dry_run = dry_run
+        self.seen = set()
+        self.pending = []
+        self.rows = 0
+        self.duplicates = 0
+        self.written = [0, 0, 0]
+
+    def add(self, df):
+        df = df.drop_duplicates(self.key, keep="last")
+        new = ~df[self.key].isin(self.seen)
+        self.duplicates += int((~new).sum())
+        df = df[new]
+        self.seen.update(df[self.key])
+        if len(df):
+            self.pending.append(df)
+            self.rows += len(df)
+        if sum(len(frame) for frame in self.pending) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        import pandas as pd
+
+        if not self.pending:
+            return
+        batch = pd.concat(self.pending, ignore_index=True)
+        self.pending = []
+        if self.dry_run:
+            return
+        # Lot partiel : seule l'empreinte des lignes sert à ignorer les lignes inchangées
+        result = self.module.load(batch, snapshot=False)
+        self.written = [total + n for total, n in zip(self.written, result)]
+
+
+# Crawl d'une page du site : chaque URL de départ (vue courante ou une par date) puis toutes ses pages
+def crawl(name, starts, pool, writer, max_pages=None):
+    module = scraper(name)
+    errors = 0
+    with ThreadPoolExecutor(max_workers=CRAWL_CONCURRENCY) as workers, metrics.page(name):
+        running = {workers.submit(parse_page, module, url, pool, as_of): (url, as_of, True) for url, as_of in starts}
+        # Les lignes de chaque page terminée partent vers le writer pendant que les suivantes se téléchargent
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, as_of, first = running.pop(future)
+                try:
+                    df, pages = future.result()
+                except Exception as e:
+                    errors += 1
+                    print(f"🔴 {url} : {e}")
+                    continue
+                writer.add(df)
+                if not first:
+                    continue
+                pages = min(pages, max_pages or pages)
+                if pages > 1:
+                    print(f"📄 {url} : {pages} pages")
+                for number in range(1, pages):
+                    next_url = page_url(url, number)
+                    running[workers.submit(parse_page, module, next_url, pool, as_of)] = (next_url, as_of, False)
+    writer.flush()
+    return errors
+
+
+def add_arguments(parser):
+    parser.add_argument("page", choices=PAGES)
+    parser.add_argument("--url-template",
+                        help="URL d'une vue datée, avec {date} (YYYY-MM-DD), ex. 'https://.../capitalisations/0?date={date}'")
+    parser.add_argument("--since", help="première date de la vue datée (YYYY-MM-DD)")
+    parser.add_argument("--until", help="dernière date de la vue datée (YYYY-MM-DD, défaut : aujourd'hui)")
+    parser.add_argument("--max-pages", type=int, help="pages maximales par URL de départ")
+    parser.add_argument("--dry-run", action="store_true", help="compter les lignes sans écrire en base")
+
+
+def run(args):
+    module = scraper(args.page)
+    if args.url_template:
+        if not args.since:
+            raise SystemExit("--since est requis avec --url-template")
+        until = args.until or date.today().isoformat()
+        starts = [(args.url_template.format(date=day.isoformat()), datetime.combine(day, datetime.min.time()))
+                  for day in weekdays(args.since, until)]
+    else:
+        starts = [(module.URL, None)]
+
+    fetcher.start_deadline(None)
+    writer = BulkWriter(module, dry_run=args.dry_run)
+    with browser_pool() as pool:
+        errors = crawl(args.page, starts, pool, writer, args.max_pages)
+    inserted, updated, unchanged = writer.written
+    print(f"✅ {args.page} : {writer.rows} lignes uniques, {writer.duplicates} doublons écartés"
+          + ("" if args.dry_run else f" ; {inserted} insérées, {updated} mises à jour, {unchanged} inchangées"))
+    return 1 if errors else 0
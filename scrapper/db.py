@@ -0,0 +1,328 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime
+from . import metrics
+
+# Description d'une table cible : nom, colonne clé, {colonne SQL: colonne du DataFrame},
+# et éventuellement le DDL qui la crée si elle n'existe pas (tables calculées)
+TableSpec = namedtuple("TableSpec", ["table", "key", "columns", "ddl"], defaults=[None])
+
+# Bilan d'une écriture : lignes insérées, mises à jour, et ignorées car identiques
+WriteResult = namedtuple("WriteResult", ["inserted", "updated", "unchanged"])
+
+# Nombre de lignes par instruction INSERT multi-lignes
+PAGE_SIZE = 1000
+
+# N'écrire que les lignes dont le contenu a changé depuis le dernier run (SKIP_UNCHANGED=0 pour tout réécrire)
+SKIP_UNCHANGED = os.getenv("SKIP_UNCHANGED", "1") != "0"
+
+# Empreintes des lignes et des tables déjà écrites
+HASH_TABLES_DDL = """
+CREATE TABLE IF NOT EXISTS scrape_row_hashes (
+    table_name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    row_hash TEXT NOT NULL,
+    PRIMARY KEY (table_name, id)
+);
+CREATE TABLE IF NOT EXISTS scrape_snapshots (
+    table_name TEXT PRIMARY KEY,
+    snapshot_hash TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+
+# Pool de connexions partagé par tous les scrapers ; pool_pre_ping écarte les connexions coupées
+# (serveur distant, TLS) avant de les réutiliser
+ENGINE_OPTIONS = dict(
+    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
+
+# Écritures de tables regroupées par transaction pendant une session (un run) ;
+# 0 = toute la session dans une seule transaction atomique
+DB_TRANSACTION_TABLES = int(os.getenv("DB_TRANSACTION_TABLES", "1"))
+
+_engine = None
+_engine_lock = threading.Lock()
+_session = None
+_queries = {}
+
+
+# Moteur SQLAlchemy unique, créé au premier besoin (aucune connexion à l'import)
+def engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from dotenv import load_dotenv
+            from sqlalchemy import create_engine
+
+            # Charger les variables d'environnement
+            load_dotenv()
+            _engine = create_engine(
+                f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
+                f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}",
+                **ENGINE_OPTIONS
+            )
+    return _engine
+
+
+def build_upsert_query(spec):
+    columns = list(spec.columns)
+    updates = ",\n    ".join(f"{col} = EXCLUDED.{col}" for col in columns if col != spec.key)
+    # xmax = 0 uniquement pour les lignes nouvellement insérées
+    return (
+        f"INSERT INTO {spec.table} ({', '.join(columns)}) VALUES %s\n"
+        f"ON CONFLICT ({spec.key}) DO UPDATE SET\n    {updates}\n"
+        f"RETURNING (xmax = 0) AS inserted"
+    )
+
+
+# Requête d'upsert construite une fois par table
+def upsert_query(spec):
+    if spec.table not in _queries:
+        _queries[spec.table] = build_upsert_query(spec)
+    return _queries[spec.table]
+
+
+# Lignes du DataFrame en tuples Python (NaN/NaT/NA -> None), dans l'ordre de la spec
+def to_records(df, spec):
+    frame = df[list(spec.columns.values())]
+    # Une même clé deux fois dans un INSERT ... ON CONFLICT est refusée : on garde la dernière
+    frame = frame.loc[~frame[spec.columns[spec.key]].duplicated(keep="last")]
+    frame = frame.astype(object).where(frame.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+def _canonical(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+# Empreinte stable d'une ligne normalisée
+def row_hash(record):
+    payload = "\x1f".join(_canonical(value) for value in record)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Empreinte de toute la table, indépendante de l'ordre des lignes
+def snapshot_hash(row_hashes):
+    return hashlib.blake2b("".join(sorted(row_hashes)).encode("ascii"), digest_size=16).hexdigest()
+
+
+# Garde seulement les lignes dont l'empreinte diffère de celle enregistrée ; None si la table est identique.
+# snapshot=False pour une écriture partielle (lot d'un crawl) : seule l'empreinte des lignes compte
+def _changed_records(cursor, spec, records, snapshot=True):
+    from psycopg2.extras import execute_values
+
+    key_index = list(spec.columns).index(spec.key)
+    keys = [str(record[key_index]) for record in records]
+    hashes = [row_hash(record) for record in records]
+
+    if snapshot:
+        snapshot = snapshot_hash(hashes)
+        cursor.execute("SELECT snapshot_hash FROM scrape_snapshots WHERE table_name = %s", (spec.table,))
+        found = cursor.fetchone()
+        if found and found[0] == snapshot:
+            return None
+
+    cursor.execute(
+        "SELECT id, row_hash FROM scrape_row_hashes WHERE table_name = %s AND id = ANY(%s)",
+        (spec.table, keys)
+    )
+    stored = dict(cursor.fetchall())
+    changed = [i for i, (key, h) in enumerate(zip(keys, hashes)) if stored.get(key) != h]
+
+    execute_values(
+        cursor,
+        "INSERT INTO scrape_row_hashes (table_name, id, row_hash) VALUES %s "
+        "ON CONFLICT (table_name, id) DO UPDATE SET row_hash = EXCLUDED.row_hash",
+        [(spec.table, keys[i], hashes[i]) for i in changed],
+        page_size=PAGE_SIZE
+    )
+    if snapshot:
+        cursor.execute(
+            "INSERT INTO scrape_snapshots (table_name, snapshot_hash) VALUES (%s, %s) "
+            "ON CONFLICT (table_name) DO UPDATE SET snapshot_hash = EXCLUDED.snapshot_hash, updated_at = now()",
+            (spec.table, snapshot)
+        )
+    return [records[i] for i in changed]
+
+
+# Après un échec, les tables seront revérifiées (leur création a pu être annulée)
+def _forget_tables(connection):
+    if not connection.invalidated:
+        connection.info.pop("created_tables", None)
+
+
+# Curseur psycopg2 d'une connexion du pool ; les tables d'empreintes et celles déclarées par la spec
+# ne sont créées qu'une fois par connexion (un aller-retour de moins par écriture)
+def _cursor(connection, spec, skip_unchanged):
+    cursor = connection.connection.cursor()
+    created = connection.info.setdefault("created_tables", set())
+    for name, ddl in (("scrape_hashes", HASH_TABLES_DDL if skip_unchanged else None), (spec.table, spec.ddl)):
+        if ddl and name not in created:
+            cursor.execute(ddl)
+            created.add(name)
+    return cursor
+
+
+def _write(connection, spec, records, page_size, skip_unchanged, snapshot=True):
+    from psycopg2.extras import execute_values
+
+    cursor = _cursor(connection, spec, skip_unchanged)
+    total = len(records)
+    if skip_unchanged:
+        records = _changed_records(cursor, spec, records, snapshot)
+        if records is None:
+            print(f"⏭️ {spec.table} : contenu identique au dernier run, aucune écriture")
+            return WriteResult(0, 0, total)
+    if not records:
+        return WriteResult(0, 0, total)
+    results = execute_values(cursor, upsert_query(spec), records, page_size=page_size, fetch=True)
+    inserted = sum(1 for (is_new,) in results if is_new)
+    return WriteResult(inserted, len(results) - inserted, total - len(results))
+
+
+class TransactionAborted(RuntimeError):
+    pass
+
+
+# Action lancée après validation : la transaction est validée quoi qu'il arrive, l'erreur est seulement signalée
+def _run_callback(callback):
+    try:
+        callback()
+    except Exception as e:
+        print(f"⚠️ Action après validation en échec ({type(e).__name__}: {e})")
+
+
+class Session:
+    """Connexion gardée pour toute une session ; les écritures de tables sont validées par lots de
+    `tables` (0 = une seule transaction, validée par commit())."""
+
+    def __init__(self, engine, tables=DB_TRANSACTION_TABLES):
+        self.engine = engine
+        self.tables = tables
+        self.connection = None
+        self.transaction = None
+        # Tables écrites dans la transaction en cours, et actions à lancer une fois validée
+        self.pending = []
+        self.callbacks = []
+        self.error = None
+        self._lock = threading.RLock()
+
+    def write(self, spec, records, page_size, skip_unchanged, snapshot=True):
+        with self._lock:
+            if self.error:
+                raise TransactionAborted(f"transaction annulée après une erreur : {self.error}")
+            if self.connection is None:
+                self.connection = self.engine.connect()
+            if self.transaction is None:
+                self.transaction = self.connection.begin()
+            try:
+                result = _write(self.connection, spec, records, page_size, skip_unchanged, snapshot)
+            except Exception as e:
+                # Seule la table en cours est perdue si la transaction ne contenait rien d'autre :
+                # elle peut être réessayée ; sinon toute la transaction est abandonnée
+                if self.pending:
+                    self.error = f"{spec.table} : {type(e).__name__}: {e}"
+                self._rollback()
+                raise
+            self.pending.append(spec.table)
+            if self.tables and len(self.pending) >= self.tables:
+                self.commit()
+            return result
+
+    def on_commit(self, callback):
+        with self._lock:
+            if self.transaction is None:
+                _run_callback(callback)
+            else:
+                self.callbacks.append(callback)
+
+    def commit(self):
+        with self._lock:
+            if self.error:
+                raise TransactionAborted(f"transaction annulée après une erreur : {self.error}")
+            if self.transaction is None:
+                return
+            self.transaction.commit()
+            callbacks = self.callbacks
+            self.transaction, self.pending, self.callbacks = None, [], []
+        # Chaque action à part : une erreur n'empêche pas les suivantes (pages marquées écrites, etc.)
+        for callback in callbacks:
+            _run_callback(callback)
+
+    def _rollback(self):
+        if self.transaction is not None:
+            self.transaction.rollback()
+        if self.connection is not None:
+            # Connexion rendue au pool : la suivante est revérifiée par pool_pre_ping
+            _forget_tables(self.connection)
+            self.connection.close()
+        self.connection, self.transaction, self.pending, self.callbacks = None, None, [], []
+
+    def close(self):
+        with self._lock:
+            self._rollback()
+
+
+# Session d'écriture : tous les upserts sur ce moteur passent par la même connexion, et
+# leurs transactions suivent `tables`. Ce qui n'a pas été validé par commit() est annulé à la sortie
+@contextmanager
+def session(tables=DB_TRANSACTION_TABLES, engine_=None):
+    global _session
+    current = Session(engine_ or engine(), tables)
+    _session = current
+    try:
+        yield current
+    finally:
+        _session = None
+        current.close()
+
+
+# Lance callback après validation des écritures en cours (immédiatement hors session)
+def on_commit(callback):
+    if _session is None:
+        _run_callback(callback)
+    else:
+        _session.on_commit(callback)
+
+
+# Upsert ensembliste : renvoie un WriteResult (insérées, mises à jour, inchangées)
+def upsert(engine, df, spec, page_size=PAGE_SIZE, max_retries=3, skip_unchanged=SKIP_UNCHANGED, snapshot=True):
+    import psycopg2
+    from sqlalchemy.exc import OperationalError
+
+    with metrics.stage("write") as stage:
+        records = to_records(df, spec)
+        stage["rows"] = len(records)
+        if not records:
+            return WriteResult(0, 0, 0)
+        for retry in range(max_retries):
+            stage["retries"] = retry
+            try:
+                current = _session
+                if current is not None and current.engine is engine:
+                    return current.write(spec, records, page_size, skip_unchanged, snapshot)
+                with engine.begin() as connection:
+                    try:
+                        return _write(connection, spec, records, page_size, skip_unchanged, snapshot)
+                    except Exception:
+                        _forget_tables(connection)
+                        raise
+            except (OperationalError, psycopg2.OperationalError):
+                if retry == max_retries - 1 or (current is not None and current.error):
+                    raise
+                time.sleep(2 ** retry)
@@ -0,0 +1,197 @@
+import json
+import os
+import socket
+from datetime import date, datetime, timezone
+from urllib.parse import urlsplit
+
+# Flux de changements : à chaque run, différence de chaque table avec son état précédent
+# (nouveaux titres, valeurs modifiées, titres disparus), publiée vers les consommateurs.
+# FEED : destinations séparées par des virgules ; vide = flux désactivé
+#   file:///chemin/spool   un fichier par table et par run (écrit puis renommé)
+#   unix:///chemin/socket  ou tcp://hôte:port   envoi au consommateur local à l'écoute
+#   notify://canal         Postgres NOTIFY, un message par ligne changée
+FEED = os.getenv("FEED", "")
+
+# Format des fichiers et des envois socket : "ndjson" ou "arrow" (flux Arrow IPC, pyarrow requis)
+FEED_FORMAT = os.getenv("FEED_FORMAT", "ndjson")
+
+# État de chaque table au dernier run publié
+FEED_SNAPSHOT_DIR = os.getenv("FEED_SNAPSHOT_DIR", ".feed")
+
+# Colonnes ignorées dans la comparaison : clé du jour et date de mise à jour
+IGNORED_COLUMNS = ("id", "update_date")
+
+# Taille maximale d'un message NOTIFY (limite Postgres : 8000 octets)
+NOTIFY_MAX_BYTES = 7900
+
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+
+
+def snapshot_path(table):
+    return os.path.join(FEED_SNAPSHOT_DIR, f"{table}.pkl")
+
+
+def previous_snapshot(table):
+    import pandas as pd
+
+    path = snapshot_path(table)
+    return pd.read_pickle(path) if os.path.exists(path) else None
+
+
+def _save_snapshot(table, df):
+    os.makedirs(FEED_SNAPSHOT_DIR, exist_ok=True)
+    tmp_path = f"{snapshot_path(table)}.{os.getpid()}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, snapshot_path(table))
+
+
+# Lignes changées entre deux états d'une table, comparées sur schema.entity (titre, indice) :
+# colonnes du schéma + "op" (insert / update / delete) + "changed" (colonnes modifiées).
+# Une ligne supprimée porte ses dernières valeurs connues
+def delta(schema, previous, current):
+    import pandas as pd
+
+    entity = list(schema.entity)
+    values = [col.name for col in schema.columns if col.name not in IGNORED_COLUMNS and col.name not in entity]
+    current = current.dropna(subset=entity).drop_duplicates(entity, keep="last")
+    if previous is None:
+        return current.assign(op=INSERT, changed="")
+    previous = previous.dropna(subset=entity).drop_duplicates(entity, keep="last")
+
+    # Clés en object : les catégories des deux états ne sont pas les mêmes
+    new = current.astype({col: object for col in entity}).set_index(entity)
+    old = previous.astype({col: object for col in entity}).set_index(entity)
+    both = new.index.intersection(old.index)
+
+    # Comparaison colonne par colonne, valeurs manquantes égales entre elles
+    a = new.loc[both, values].astype(object)
+    b = old.loc[both, values].astype(object)
+    a, b = a.where(a.notna(), None), b.where(b.notna(), None)
+    differs = ~((a == b) | (a.isna() & b.isna()))
+    updated = differs.any(axis=1).to_numpy()
+    changed = [",".join(differs.columns[row]) for row in differs.to_numpy()[updated]]
+
+    parts = [
+        new.loc[new.index.difference(old.index)].assign(op=INSERT, changed=""),
+        new.loc[both[updated]].assign(op=UPDATE, changed=changed),
+        old.loc[old.index.difference(new.index)].assign(op=DELETE, changed=""),
+    ]
+    return pd.concat(parts).reset_index()[list(current.columns) + ["op", "changed"]]
+
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# Événements JSON : une ligne changée par événement
+def events(table, changes, run_at):
+    records = changes.astype(object).where(changes.notna(), None).to_dict("records")
+    for record in records:
+        op, changed = record.pop("op"), record.pop("changed")
+        yield {
+            "table": table,
+            "op": op,
+            "changed": changed.split(",") if changed else [],
+            "row": {key: _json_value(value) for key, value in record.items()},
+            "run_at": run_at,
+        }
+
+
+def to_ndjson(table, changes, run_at):
+    lines = (json.dumps(event, ensure_ascii=False) + "\n" for event in events(table, changes, run_at))
+    return "".join(lines).encode("utf-8")
+
+
+def to_arrow(table, changes, run_at):
+    import pyarrow as pa
+
+    frame = changes.copy()
+    for col in frame.columns:
+        if str(frame[col].dtype) == "category":
+            frame[col] = frame[col].astype(object)
+    batch = pa.Table.from_pandas(frame.assign(table=table, run_at=run_at), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_table(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def _spool(path, table, payload):
+    directory = os.path.join(path, table)
+    os.makedirs(directory, exist_ok=True)
+    # Noms triés dans l'ordre des runs
+    name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}.{'arrow' if FEED_FORMAT == 'arrow' else 'ndjson'}"
+    tmp_path = os.path.join(directory, f".{name}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    # Renommage atomique : un consommateur qui surveille le répertoire ne voit que des fichiers complets
+    os.replace(tmp_path, os.path.join(directory, name))
+
+
+def _send(target, payload):
+    parts = urlsplit(target)
+    if parts.scheme == "unix":
+        family, address = socket.AF_UNIX, parts.path
+    else:
+        family, address = socket.AF_INET, (parts.hostname, parts.port)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(10)
+        sock.connect(address)
+        sock.sendall(payload)
+
+
+# Postgres NOTIFY (remplaçable par un autre émetteur local : notify(channel, messages))
+def pg_notify(channel, messages):
+    from . import db
+
+    with db.engine().begin() as connection:
+        cursor = connection.connection.cursor()
+        for message in messages:
+            cursor.execute("SELECT pg_notify(%s, %s)", (channel, message))
+
+
+notify = pg_notify
+
+
+def _notify_messages(table, changes, run_at):
+    for event in events(table, changes, run_at):
+        message = json.dumps(event, ensure_ascii=False)
+        if len(message.encode("utf-8")) > NOTIFY_MAX_BYTES:
+            # Ligne trop grande pour NOTIFY : seule sa clé est annoncée
+            event["row"] = {key: value for key, value in event["row"].items()
+                            if key in ("id", "symbol", "name", "index_name")}
+            message = json.dumps(event, ensure_ascii=False)
+        yield message
+
+
+# Calcule et publie le delta d'une table par rapport au dernier run publié ; renvoie le nombre de lignes
+# changées. Une destination en échec est signalée sans faire échouer le run
+def publish(schema, df, targets=None):
+    targets = [target.strip() for target in (FEED if targets is None else targets).split(",") if target.strip()]
+    if not targets or schema.entity is None:
+        return 0
+    changes = delta(schema, previous_snapshot(schema.table), df)
+    run_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if len(changes):
+        payload = (to_arrow if FEED_FORMAT == "arrow" else to_ndjson)(schema.table, changes, run_at)
+        for target in targets:
+            try:
+                scheme = urlsplit(target).scheme
+                if scheme == "file":
+                    _spool(urlsplit(target).path, schema.table, payload)
+                elif scheme in ("unix", "tcp"):
+                    _send(target, payload)
+                elif scheme == "notify":
+                    notify(urlsplit(target).netloc, list(_notify_messages(schema.table, changes, run_at)))
+                else:
+                    raise ValueError(f"destination inconnue : {target}")
+            except Exception as e:
+                print(f"⚠️ Flux de changements {schema.table} -> {target} : {e}")
+        counts = changes["op"].value_counts()
+        print(f"📣 {schema.table} : {', '.join(f'{int(counts[op])} {op}' for op in (INSERT, UPDATE, DELETE) if op in counts)}")
+    _save_snapshot(schema.table, df)
+    return len(changes)
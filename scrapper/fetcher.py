@@ -0,0 +1,340 @@
+import codecs
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from itertools import islice
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import etree, html as lxml_html
+from . import archive, cache, metrics
+
+# Backend de récupération : "http" (requests + lxml, Selenium en secours) ou "selenium"
+BACKEND = os.getenv("SCRAPER_BACKEND", "http")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+# Politesse par hôte : requêtes simultanées max et délai minimal entre deux départs
+PER_HOST_LIMIT = int(os.getenv("PER_HOST_LIMIT", "2"))
+POLITENESS_DELAY = float(os.getenv("POLITENESS_DELAY", "0.5"))
+
+UNKNOWN_UPDATE = "Unknown update date"
+
+# Échéance globale du run (time.monotonic), fixée par start_deadline ; None = pas de limite
+_deadline = None
+
+# Session HTTP partagée (connexions keep-alive réutilisées entre les pages)
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=2)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+session.headers.update({
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.8",
+})
+
+# Expressions XPath compilées une fois (équivalent de "table.table tbody tr")
+_TABLES = etree.XPath("//table[contains(concat(' ', normalize-space(@class), ' '), ' table ')]")
+_CELLS = etree.XPath(".//td")
+_LAST_UPDATE = etree.XPath("//*[contains(text(),'Last update')]")
+_SPACES = re.compile(r"[ \t\r\n]+")
+
+
+def start_deadline(seconds):
+    global _deadline
+    _deadline = time.monotonic() + seconds if seconds else None
+
+
+# Délai d'une étape, borné par le temps restant avant l'échéance du run
+def budget(timeout):
+    if _deadline is None:
+        return timeout
+    remaining = _deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Échéance du run dépassée")
+    return min(timeout, remaining)
+
+
+class _HostSlot:
+    def __init__(self):
+        self.semaphore = threading.BoundedSemaphore(PER_HOST_LIMIT)
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+# Limite la charge sur un même hôte quand plusieurs pages sont récupérées en parallèle
+@contextmanager
+def polite(url):
+    host = urlsplit(url).netloc
+    with _hosts_lock:
+        slot = _hosts.setdefault(host, _HostSlot())
+    # Attente d'un créneau (sémaphore + espacement des départs), mesurée comme étape "wait"
+    with metrics.stage("wait"):
+        slot.semaphore.acquire()
+        with slot.lock:
+            now = time.monotonic()
+            wait = slot.next_start - now
+            slot.next_start = max(now, slot.next_start) + POLITENESS_DELAY
+        if wait > 0:
+            time.sleep(wait)
+    try:
+        yield
+    finally:
+        slot.semaphore.release()
+
+
+# Télécharge une page ; avec une copie en cache, la requête est conditionnelle et la copie
+# est resservie si la page n'a pas changé. Les pages nouvelles sont archivées (sauf archive=False :
+# simple lecture du marqueur) et mises en cache
+def fetch_html(url, cached=None, archive=True):
+    with polite(url), metrics.stage("fetch") as stage:
+        response = session.get(url, headers=cache.validators(cached), timeout=budget(HTTP_TIMEOUT))
+        # Tentatives refaites par l'adaptateur HTTP (urllib3)
+        retries = getattr(response.raw, "retries", None)
+        stage["retries"] = len(retries.history) if retries else 0
+        stage["cache"] = "revalidated" if response.status_code == 304 and cached else "miss"
+    if stage["cache"] == "revalidated":
+        cache.touch(cached)
+        if archive:
+            archive_cached(cached)
+        return cached.html
+    response.raise_for_status()
+    if archive:
+        archive_page(url, response.text)
+    cache.put(url, response.text, response.headers, archived=archive)
+    return response.text
+
+
+def parse_html(text):
+    return lxml_html.fromstring(text)
+
+
+def cell_text(element):
+    # Même rendu que WebElement.text : espaces regroupés, \xa0 conservé
+    return _SPACES.sub(" ", element.text_content()).strip()
+
+
+# Cellules des lignes de corps de tous les tableaux "table.table", ligne par ligne
+# (parcours paresseux de l'arbre : aucune liste de toutes les lignes n'est construite)
+def iter_body_cells(doc):
+    for table in _TABLES(doc):
+        for tr in table.iter("tr"):
+            if tr.getparent().tag not in ("thead", "tfoot"):
+                yield [cell_text(td) for td in _CELLS(tr)]
+
+
+# Cellules de toutes les lignes de chaque tableau, en sautant la première (en-tête)
+def iter_cells_after_header(doc):
+    for table in _TABLES(doc):
+        for tr in islice(table.iter("tr"), 1, None):
+            yield [cell_text(td) for td in _CELLS(tr)]
+
+
+def body_cells(doc):
+    return list(iter_body_cells(doc))
+
+
+def cells_after_header(doc):
+    return list(iter_cells_after_header(doc))
+
+
+# Lecture incrémentale d'une page (fichier binaire, archive gzip ouverte ou texte) : la page est lue par
+# blocs de STREAM_READ_BYTES et chaque ligne <tr> est produite dès qu'elle est fermée, sans arbre.
+# Analyseur HTMLParser de la bibliothèque standard : l'analyseur incrémental HTML de libxml2 garde tout le
+# texte reçu en mémoire. Événements : (ROW, cellules) et (LAST_UPDATE, texte), dans l'ordre du document
+ROW, LAST_UPDATE = "row", "last_update"
+STREAM_READ_BYTES = 64 * 1024
+
+# Éléments sans balise fermante
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+class _RowReader(HTMLParser):
+    def __init__(self, skip_header):
+        super().__init__(convert_charrefs=True)
+        self.skip_header = skip_header
+        self.events = []
+        self.open_tags = []
+        # Tableaux ouverts : [table.table ?, section (thead / tbody / tfoot), lignes vues]
+        self.tables = []
+        self.row = None
+        self.cell = None
+        # Élément portant "Last update" : profondeur dans open_tags et texte lu
+        self.update_depth = None
+        self.update_text = None
+        self.found_update = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("td", "th", "tr") and self.cell is not None:
+            self._end_cell()
+        if tag == "tr" and self.row is not None:
+            self._end_row()
+        if tag == "table":
+            classes = f" {' '.join((dict(attrs).get('class') or '').split())} "
+            self.tables.append([" table " in classes, None, 0])
+        elif tag in ("thead", "tbody", "tfoot") and self.tables:
+            self.tables[-1][1] = tag
+        elif tag == "tr" and self.tables:
+            self.row = []
+        elif tag == "td" and self.row is not None:
+            self.cell = []
+        if tag not in _VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self.open_tags:
+            return
+        # Éléments restés ouverts fermés avec celui-ci
+        while self.open_tags:
+            closed = self.open_tags.pop()
+            self._close(closed)
+            if closed == tag:
+                break
+
+    def _close(self, tag):
+        if self.update_depth is not None and len(self.open_tags) < self.update_depth:
+            self.found_update = True
+            self.events.append((LAST_UPDATE, _SPACES.sub(" ", "".join(self.update_text)).strip()))
+            self.update_depth = None
+        if tag == "td" and self.cell is not None:
+            self._end_cell()
+        elif tag == "tr" and self.row is not None:
+            self._end_row()
+        elif tag in ("thead", "tbody", "tfoot") and self.tables:
+            self.tables[-1][1] = None
+        elif tag == "table" and self.tables:
+            if self.row is not None:
+                self._end_row()
+            self.tables.pop()
+
+    def _end_cell(self):
+        self.row.append(_SPACES.sub(" ", "".join(self.cell)).strip())
+        self.cell = None
+
+    def _end_row(self):
+        if self.cell is not None:
+            self._end_cell()
+        table = self.tables[-1]
+        table[2] += 1
+        if table[0] and (table[2] > 1 if self.skip_header else table[1] not in ("thead", "tfoot")):
+            self.events.append((ROW, self.row))
+        self.row = None
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+        if self.update_depth is not None:
+            self.update_text.append(data)
+        elif not self.found_update and "Last update" in data and self.cell is None:
+            self.update_depth = len(self.open_tags)
+            self.update_text = [data]
+
+
+def _blocks(source):
+    if isinstance(source, (str, bytes)):
+        for start in range(0, len(source), STREAM_READ_BYTES):
+            yield source[start:start + STREAM_READ_BYTES]
+        return
+    while True:
+        block = source.read(STREAM_READ_BYTES)
+        if not block:
+            return
+        yield block
+
+
+def _stream_cells(source, skip_header):
+    reader = _RowReader(skip_header)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for block in _blocks(source):
+        reader.feed(decoder.decode(block) if isinstance(block, bytes) else block)
+        yield from reader.events
+        reader.events.clear()
+    reader.close()
+    # Fin de page : éléments encore ouverts fermés (dernière ligne sans </tr>, etc.)
+    if reader.open_tags:
+        reader.handle_endtag(reader.open_tags[0])
+    yield from reader.events
+
+
+def stream_body_cells(source):
+    return _stream_cells(source, skip_header=False)
+
+
+def stream_cells_after_header(source):
+    return _stream_cells(source, skip_header=True)
+
+
+def last_update_text(doc):
+    found = _LAST_UPDATE(doc)
+    return cell_text(found[0]) if found else UNKNOWN_UPDATE
+
+
+# Archive la page brute sans jamais faire échouer le scraping
+def archive_page(url, html):
+    try:
+        archive.save_page(url, html)
+    except OSError as e:
+        print(f"⚠️ Archivage impossible pour {url} ({e})")
+
+
+# Copie en cache lue sans archivage (démon de poll) et réutilisée pour le scraping : archivée une fois
+def archive_cached(page):
+    if not page.archived:
+        archive_page(page.url, page.html)
+        cache.mark_archived(page.url)
+
+
+def _selenium_page(url, pool, selenium_scrape):
+    # Sans pool fourni, un navigateur temporaire est lancé pour cette seule page
+    if pool is None:
+        from .workers import browser_pool
+        with browser_pool() as pool:
+            return _selenium_page(url, pool, selenium_scrape)
+    with polite(url):
+        result, html = pool.scrape(url, selenium_scrape)
+    archive_page(url, html)
+    # Page rendue gardée pour FETCH_CACHE_TTL (pas de validateurs : pas de revalidation)
+    cache.put(url, html, source="selenium")
+    return result
+
+
+def _extract(html, extract):
+    with metrics.stage("extract") as stage:
+        doc = parse_html(html)
+        cells = extract(doc)
+        stage["rows"] = len(cells)
+    return cells, last_update_text(doc)
+
+
+# Récupère (cellules, texte "Last update") d'une page ; Selenium seulement si le tableau manque, ou la
+# date de mise à jour pour les pages qui en ont besoin (require_last_update, comme l'attente Selenium).
+# Une copie récente du cache est réutilisée sans requête
+def scrape_page(url, pool, selenium_scrape, extract=body_cells, require_last_update=False):
+    def complete(cells, last_update):
+        return cells and (last_update != UNKNOWN_UPDATE or not require_last_update)
+
+    cached = cache.get(url)
+    if cached is not None and cache.fresh(cached):
+        cells, last_update = _extract(cached.html, extract)
+        if complete(cells, last_update):
+            archive_cached(cached)
+            return cells, last_update
+    if BACKEND == "http":
+        try:
+            cells, last_update = _extract(fetch_html(url, cached if cached and cached.source == "http" else None),
+                                          extract)
+            if complete(cells, last_update):
+                return cells, last_update
+            if cells:
+                print(f"⚠️ Date de mise à jour absente sur {url}, repli sur Selenium")
+            else:
+                print(f"⚠️ Aucun tableau trouvé sur {url}, repli sur Selenium")
+        except requests.RequestException as e:
+            print(f"⚠️ Échec HTTP sur {url} ({e}), repli sur Selenium")
+    return _selenium_page(url, pool, selenium_scrape)
@@ -0,0 +1,123 @@
+import os
+from datetime import date
+
+# Historique en colonnes (Parquet) : <HISTORY_DIR>/<table>/month=YYYY-MM/YYYY-MM-DD.parquet
+# Un fichier par table et par date, écrit seulement s'il est nouveau ou si son contenu a changé
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+HISTORY_EXPORT = os.getenv("HISTORY_EXPORT", "1") != "0"
+
+# Colonne de date de chaque table ; sans colonne (obligations), la date du run est ajoutée
+DATE_COLUMN = "update_date"
+
+# Colonnes de dates stockées en date32
+DATE_COLUMNS = ("update_date", "issue_date", "maturity_date", "last_payment_date")
+
+# Colonnes répétées d'un jour à l'autre, encodées en dictionnaire
+DICTIONARY_COLUMNS = ("symbol", "name", "index_name", "bond_type")
+
+# Clé des métadonnées Parquet contenant l'empreinte du contenu
+SNAPSHOT_KEY = b"brvm.snapshot"
+
+_missing_pyarrow = False
+
+
+def table_dir(table):
+    return os.path.join(HISTORY_DIR, table)
+
+
+def partition_path(table, day):
+    return os.path.join(table_dir(table), f"month={day:%Y-%m}", f"{day:%Y-%m-%d}.parquet")
+
+
+# Colonnes SQL de la spec, dates en datetime.date
+def to_frame(df, spec, as_of=None):
+    import pandas as pd
+
+    frame = df[list(spec.columns.values())].set_axis(list(spec.columns), axis=1)
+    # Catégories relues en chaînes : l'encodage dictionnaire est fait par Parquet, identique d'un fichier à l'autre
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype(object)
+    if DATE_COLUMN not in frame:
+        frame[DATE_COLUMN] = pd.Timestamp(as_of or date.today()).normalize()
+    for col in DATE_COLUMNS:
+        if col in frame:
+            frame[col] = pd.to_datetime(frame[col], errors="coerce").dt.date
+    return frame.sort_values(spec.key, ignore_index=True)
+
+
+# Empreinte du contenu indépendante de l'ordre des lignes
+def snapshot(frame):
+    import pandas as pd
+
+    hashes = pd.util.hash_pandas_object(frame.astype(str), index=False)
+    return f"{int(hashes.sum()) & 0xFFFFFFFFFFFFFFFF:016x}-{len(frame)}".encode("ascii")
+
+
+def _stored_snapshot(path):
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(path):
+        return None
+    return (pq.read_schema(path).metadata or {}).get(SNAPSHOT_KEY)
+
+
+# Ajoute le DataFrame normalisé d'une table à l'historique ; renvoie les fichiers écrits
+def export(spec, df, as_of=None):
+    global _missing_pyarrow
+    if not HISTORY_EXPORT or df.empty:
+        return []
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        if not _missing_pyarrow:
+            _missing_pyarrow = True
+            print("⚠️ pyarrow n'est pas installé : historique Parquet désactivé")
+        return []
+
+    written = []
+    frame = to_frame(df, spec, as_of)
+    for day, rows in frame.groupby(DATE_COLUMN, observed=True, sort=True):
+        path = partition_path(spec.table, day)
+        rows = rows.reset_index(drop=True)
+        digest = snapshot(rows)
+        if _stored_snapshot(path) == digest:
+            continue
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), SNAPSHOT_KEY: digest})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd",
+                       use_dictionary=[col for col in DICTIONARY_COLUMNS if col in rows])
+        os.replace(tmp_path, path)
+        written.append(path)
+    if written:
+        print(f"🗄️ {spec.table} : {len(written)} partition(s) Parquet écrite(s)")
+    return written
+
+
+# Lecture en mémoire mappée ; seuls les mois concernés sont ouverts. Renvoie une table Arrow
+# (.to_pandas() pour un DataFrame)
+def read(table, start=None, end=None, columns=None, symbols=None):
+    import pyarrow.parquet as pq
+
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = date.fromisoformat(end) if isinstance(end, str) else end
+    filters = []
+    if start:
+        filters += [("month", ">=", f"{start:%Y-%m}"), (DATE_COLUMN, ">=", start)]
+    if end:
+        filters += [("month", "<=", f"{end:%Y-%m}"), (DATE_COLUMN, "<=", end)]
+    if symbols:
+        key = "index_name" if table == "indexes" else "symbol"
+        filters.append((key, "in", list(symbols)))
+    return pq.read_table(
+        table_dir(table),
+        columns=columns,
+        filters=filters or None,
+        memory_map=True,
+        partitioning="hive",
+        # Symboles et noms relus directement en dictionnaire (pas de chaîne par ligne)
+        read_dictionary=list(DICTIONARY_COLUMNS),
+    )
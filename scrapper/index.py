@@ -1,111 +1,94 @@
-import os
-import time
-import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from sqlalchemy import create_engine, text
-from dotenv import load_dotenv
-import os
-load_dotenv()
-
-# Charger les variables d'environnement
-load_dotenv()
-
-# Créer l'engine pour la base PostgreSQL
-target_postgres_engine = create_engine(
-    f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
-    f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-)
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-
-CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "/usr/lib/chromium/chromedriver")
-
-driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+from . import db, fetcher, schema
 
 # URL to scrape index data
-url = "https://www.brvm.org/en/indices"
-driver.get(url)
-time.sleep(5)  # wait for JavaScript to render
-
-# Find index tables
-tables = driver.find_elements(By.CSS_SELECTOR, "table.table")
-
-index_data = []
-for table in tables:
-    rows = table.find_elements(By.TAG_NAME, "tr")
-    for row in rows[1:]:  # Skip header
-        cols = row.find_elements(By.TAG_NAME, "td")
-        if len(cols) >= 5:
-            name = cols[0].text.strip()
-            prev_close = cols[1].text.strip()
-            close = cols[2].text.strip()
-            change_pct = cols[3].text.strip().replace('%', '')
-            ytd_change = cols[4].text.strip().replace('%', '')
-            index_data.append([name, prev_close, close, change_pct, ytd_change])
-
-# Close browser
-driver.quit()
-
-# Convert to DataFrame
-df = pd.DataFrame(index_data, columns=[
-    "INDEX_NAME", "PREVIOUS_CLOSE", "CLOSE", "CHANGE_PERCENT", "YTD_CHANGE_PERCENT"
-])
-
-# Clean numeric columns
-for col in ["PREVIOUS_CLOSE", "CLOSE", "CHANGE_PERCENT", "YTD_CHANGE_PERCENT"]:
-    df[col] = df[col].str.replace(' ', '').str.replace(',', '.').astype(float)
-
-# Add update date
-df["UPDATE_DATE"] = pd.Timestamp.today().normalize()
-
-# Create unique ID
-df["ID"] = df["INDEX_NAME"] + '-' + df["UPDATE_DATE"].dt.strftime('%Y-%m-%d')
-
-# Rename columns to match database schema
-data = df.rename(columns={
-    'INDEX_NAME': 'index_name',
-    'PREVIOUS_CLOSE': 'previous_close',
-    'CLOSE': 'close',
-    'CHANGE_PERCENT': 'change_percent',
-    'YTD_CHANGE_PERCENT': 'ytd_change_percent',
-    'UPDATE_DATE': 'update_date',
-    'ID': 'id'
-})
-
-# Insert query with upsert logic
-insert_query = """
-INSERT INTO indexes (
-    id, index_name, previous_close, close, 
-    change_percent, ytd_change_percent, update_date
-) VALUES (
-    :id, :index_name, :previous_close, :close,
-    :change_percent, :ytd_change_percent, :update_date
-)
-ON CONFLICT (id) DO UPDATE SET
-    index_name = EXCLUDED.index_name,
-    previous_close = EXCLUDED.previous_close,
-    close = EXCLUDED.close,
-    change_percent = EXCLUDED.change_percent,
-    ytd_change_percent = EXCLUDED.ytd_change_percent,
-    update_date = EXCLUDED.update_date
-"""
-
-# Execute insert
-with target_postgres_engine.begin() as connection:
-    for _, row in data.iterrows():
-        connection.execute(text(insert_query), {
-            'id': row['id'],
-            'index_name': row['index_name'],
-            'previous_close': float(row['previous_close']) if pd.notna(row['previous_close']) else None,
-            'close': float(row['close']) if pd.notna(row['close']) else None,
-            'change_percent': float(row['change_percent']) if pd.notna(row['change_percent']) else None,
-            'ytd_change_percent': float(row['ytd_change_percent']) if pd.notna(row['ytd_change_percent']) else None,
-            'update_date': row['update_date']
-        })
-
-print("✅ Index data successfully inserted into 'indexes' table.")
+URL = "https://www.brvm.org/en/indices"
+
+
+# Maximum time for JavaScript to render the tables (seconds)
+PAGE_TIMEOUT = 15
+
+# Pas de date de mise à jour sur la page des indices (voir fetcher.scrape_page)
+REQUIRE_LAST_UPDATE = False
+
+
+def scrape_selenium(driver, url=URL):
+    from . import browser
+
+    # Wait for stable tables, then read them in one call, skipping each header row
+    cells, last_update_text = browser.load_table(
+        driver, url, fetcher.budget(PAGE_TIMEOUT), skip_header=True
+    )
+    return cells, last_update_text or fetcher.UNKNOWN_UPDATE
+
+
+def parse_rows(cells):
+    # Complete rows only; numbers are cleaned column by column in transform
+    return [cols[:5] for cols in cells if len(cols) >= 5]
+
+
+# Cell extraction from HTML (live or archived pages), skipping each table header
+CELLS = fetcher.cells_after_header
+STREAM_CELLS = fetcher.stream_cells_after_header
+
+
+def fetch(pool=None):
+    # Fetch only (HTTP, Selenium fallback): no pandas import, no database access
+    return fetcher.scrape_page(URL, pool, scrape_selenium, extract=CELLS,
+                               require_last_update=REQUIRE_LAST_UPDATE)
+
+
+# Target table: columns and types, key "<index_name>-<update_date>"
+SCHEMA = schema.Schema("indexes", (
+    schema.Column("index_name", schema.CATEGORY, nullable=False),
+    schema.Column("previous_close", schema.FLOAT),
+    schema.Column("close", schema.FLOAT),
+    schema.Column("change_percent", schema.FLOAT),
+    schema.Column("ytd_change_percent", schema.FLOAT),
+    schema.Column("update_date", schema.DATE, nullable=False),
+), schema.join_key("index_name", "update_date"), entity=("index_name",))
+
+SPEC = schema.spec(SCHEMA)
+
+
+def transform(index_data, as_of=None):
+    import pandas as pd
+    from . import normalize
+
+    # Columns named as in the table from the start
+    df = pd.DataFrame(index_data, columns=[
+        "index_name", "previous_close", "close", "change_percent", "ytd_change_percent"
+    ])
+
+    # Clean numeric columns
+    df = normalize.numeric_columns(df, {
+        "previous_close": "float64",
+        "close": "float64",
+        "change_percent": "float64",
+        "ytd_change_percent": "float64"
+    })
+
+    # Add update date
+    df["update_date"] = pd.Timestamp(as_of or pd.Timestamp.today()).normalize()
+    return schema.conform(df, SCHEMA)
+
+
+def load(data, **options):
+    return db.upsert(db.engine(), data, SPEC, **options)
+
+
+# Raw cells -> DataFrame ready to load; the page has no date, so as_of (default today) is used
+def parse(cells, last_update_text, as_of=None):
+    return transform(parse_rows(cells), as_of)
+
+
+def extract(pool=None):
+    return parse(*fetch(pool))
+
+
+def save(df):
+    inserted, updated, unchanged = load(df)
+    print(f"✅ Index data successfully inserted into 'indexes' table ({inserted} inserted, {updated} updated, {unchanged} unchanged).")
+
+
+def run(pool=None):
+    save(extract(pool))
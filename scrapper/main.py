@@ -1,15 +1,173 @@
+import json
 import os
-import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+from . import PAGES, analytics, db, feed, fetcher, history, metrics, scraper
+from .workers import browser_pool
+from .state import FETCHED, PARSED, WRITTEN, STATE_DIR, RunState
 
-# Lister tous les fichiers .py dans scrapper/ sauf main.py
-files = sorted([f for f in os.listdir(BASE_DIR) if f.endswith(".py") and f != "main.py"])
+# Nombre de navigateurs gardés ouverts (processus isolés par défaut, voir workers.BROWSER_POOL)
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
 
-for filename in files:
-    filepath = os.path.join(BASE_DIR, filename)
-    print(f"🟢 Exécution de {filename}...")
+# Nombre de pages récupérées et parsées en parallèle
+CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "4"))
+
+# Durée maximale de tout le run (secondes)
+RUN_DEADLINE = float(os.getenv("RUN_DEADLINE", "600"))
+
+# Nouveaux essais d'une étape en échec (récupération ou écriture), délai initial doublé à chaque essai
+STAGE_RETRIES = int(os.getenv("STAGE_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "2"))
+
+# Rapport JSON du run ("-" pour la sortie standard)
+REPORT_PATH = os.getenv("RUN_REPORT", os.path.join(STATE_DIR, "report.json"))
+
+
+# Une étape d'une page, refaite avec un délai exponentiel si elle échoue (jamais au-delà de l'échéance du run).
+# Pas de nouvel essai quand la transaction de la session est annulée : il échouerait de la même façon
+def with_retries(state, name, stage, function, *args):
+    for attempt in range(STAGE_RETRIES + 1):
+        try:
+            return function(*args)
+        except (TimeoutError, db.TransactionAborted):
+            raise
+        except Exception as e:
+            state.attempt(name, stage, f"{type(e).__name__}: {e}")
+            if attempt == STAGE_RETRIES:
+                raise
+            delay = fetcher.budget(RETRY_BACKOFF * 2 ** attempt)
+            print(f"🔁 {name} : échec de {stage} ({e}), nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
+
+
+# Récupération puis parsing d'une page, en repartant du dernier point de reprise ;
+# les étapes sont rattachées à la page dans les métriques
+def extract(name, pool, state):
+    module = scraper(name)
+    with metrics.page(name):
+        if state.stage(name) == PARSED:
+            return state.load_frame(name)
+        if state.stage(name) == FETCHED:
+            cells, last_update_text = state.load_cells(name)
+        else:
+            cells, last_update_text = with_retries(state, name, "fetch", module.fetch, pool)
+            state.fetched(name, cells, last_update_text)
+        # Le parsing est déterministe : pas de nouvel essai, la page reste "fetched" pour la reprise
+        with metrics.stage("normalize") as stage:
+            df = module.parse(cells, last_update_text, as_of=state.as_of(name))
+            stage["rows"] = len(df)
+        state.parsed(name, df, stage.get("coercion_failures"))
+    return df
+
+
+# Sortie annexe lancée après validation : une erreur est signalée sans faire échouer (ni refaire)
+# l'écriture en base, déjà validée
+def side_output(label, function, *args):
     try:
-        subprocess.run(["python", filepath], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"🔴 Erreur lors de l'exécution de {filename} : {e}")
+        function(*args)
+    except Exception as e:
+        print(f"⚠️ {label} impossible ({type(e).__name__}: {e})")
+
+
+# Écriture en base puis, une fois la transaction validée, ajout à l'historique Parquet
+# et publication des changements (publish=False : pages rejouées, voir replay)
+def save(name, df, as_of=None, publish=True):
+    module = scraper(name)
+    with metrics.page(name):
+        module.save(df)
+    db.on_commit(lambda: side_output(f"Historique Parquet de {name}", history.export, module.SPEC, df, as_of))
+    if publish:
+        db.on_commit(lambda: side_output(f"Flux de changements de {name}", feed.publish, module.SCHEMA, df))
+
+
+def write(name, df, state):
+    with_retries(state, name, "write", save, name, df, state.as_of(name))
+    db.on_commit(lambda: state.written(name))
+
+
+# Tables compagnes calculées à partir des pages du run, écrites dans la même session
+# (et la même transaction avec DB_TRANSACTION_TABLES=0) ; une erreur ne fait pas échouer les pages
+def write_analytics(frames, as_of=None):
+    try:
+        with metrics.page("analytics"):
+            with metrics.stage("normalize") as stage:
+                tables = analytics.compute(frames, as_of)
+                stage["rows"] = sum(len(df) for _, df in tables)
+            for spec, df in tables:
+                analytics.save(spec, df)
+    except Exception as e:
+        print(f"🔴 Indicateurs calculés non écrits : {e}")
+
+
+def write_report(report, path=REPORT_PATH):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if path == "-":
+        print(text)
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+
+
+# Scrape et écrit les pages demandées dans le même processus ; Chromium n'est lancé qu'en repli.
+# Avec resume=True, un run interrompu récent reprend là où chaque page s'était arrêtée ;
+# un pool de navigateurs déjà ouvert peut être fourni (mode poll). Renvoie le nombre de pages en erreur.
+def run(pages=PAGES, deadline=RUN_DEADLINE, resume=False, report_path=REPORT_PATH, pool=None,
+        with_analytics=analytics.ANALYTICS):
+    fetcher.start_deadline(deadline)
+    metrics.reset()
+    state = RunState(pages, resume)
+    if state.resumed:
+        print(f"⏯️ Reprise du run {state.data['run_id']}")
+
+    # Les pages sont récupérées en parallèle ; un seul thread écrit en base, sur une seule connexion,
+    # ce qui recouvre l'écriture d'une page avec le parsing des suivantes
+    with db.session() as session, \
+            (browser_pool(size=POOL_SIZE) if pool is None else nullcontext(pool)) as pool, \
+            ThreadPoolExecutor(max_workers=CONCURRENCY) as workers, \
+            ThreadPoolExecutor(max_workers=1) as writer:
+        extracting = {}
+        for name in pages:
+            if state.stage(name) == WRITTEN:
+                print(f"⏭️ {name} déjà écrit, ignoré")
+                continue
+            print(f"🟢 Exécution de {name}...")
+            extracting[workers.submit(extract, name, pool, state)] = name
+
+        saving = {}
+        frames = {}
+        for future in as_completed(extracting):
+            name = extracting[future]
+            try:
+                frames[name] = future.result()
+                saving[writer.submit(write, name, frames[name], state)] = name
+            except Exception as e:
+                state.failed(name, f"{type(e).__name__}: {e}")
+                print(f"🔴 Erreur lors de l'exécution de {name} : {e}")
+        if with_analytics:
+            writer.submit(write_analytics, frames, state.as_of("bond") if "bond" in frames else None)
+
+        for future in as_completed(saving):
+            try:
+                future.result()
+            except Exception as e:
+                state.failed(saving[future], f"{type(e).__name__}: {e}")
+                print(f"🔴 Erreur lors de l'exécution de {saving[future]} : {e}")
+
+        # Dernière transaction (toute la session avec DB_TRANSACTION_TABLES=0) : si elle échoue,
+        # aucune de ses pages n'est marquée écrite et la reprise les réécrira
+        try:
+            session.commit()
+        except Exception as e:
+            for name in saving.values():
+                if state.stage(name) != WRITTEN:
+                    state.failed(name, f"{type(e).__name__}: {e}")
+            print(f"🔴 Validation de la transaction impossible : {e}")
+
+    print(metrics.summary())
+    metrics.export()
+    report = state.finish()
+    write_report(report, report_path)
+    return len(report["failed_pages"])
@@ -0,0 +1,245 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure mémoire
+    resource = None
+
+# Mesures par page et par étape : startup, fetch, wait, extract, normalize, write
+
+# Journal JSON (une ligne par étape) : chemin de fichier, "-" pour stderr, vide pour désactiver
+METRICS_LOG = os.getenv("METRICS_LOG", "-")
+
+# Sorties Prometheus optionnelles : fichier pour le textfile collector de node_exporter, et Pushgateway
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+METRICS_PUSHGATEWAY = os.getenv("METRICS_PUSHGATEWAY", "")
+METRICS_JOB = os.getenv("METRICS_JOB", "brvm_scrapper")
+
+STAGES = ("startup", "fetch", "wait", "extract", "normalize", "write")
+
+records = []
+_lock = threading.Lock()
+_local = threading.local()
+_run_start = time.monotonic()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# Pic de mémoire résidente du processus (Mo) ; ru_maxrss est en Ko sous Linux
+def max_rss_mb():
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# Mémoire résidente actuelle du processus (Mo), lue dans /proc (Linux) ; None ailleurs
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return round(int(f.read().split()[1]) * _PAGE_SIZE / 1024 / 1024, 1)
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def reset():
+    global _run_start
+    with _lock:
+        records.clear()
+    _run_start = time.monotonic()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# Page courante du thread : les étapes mesurées dans le bloc lui sont rattachées
+@contextmanager
+def page(name):
+    previous = getattr(_local, "page", None)
+    _local.page = name
+    try:
+        yield
+    finally:
+        _local.page = previous
+
+
+def _log(record):
+    if not METRICS_LOG:
+        return
+    line = json.dumps(record, ensure_ascii=False)
+    with _lock:
+        if METRICS_LOG == "-":
+            print(line, file=sys.stderr, flush=True)
+        else:
+            with open(METRICS_LOG, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+# Mesure une étape ; le bloc peut renseigner stage["rows"] et incrémenter stage["retries"] (ou des compteurs,
+# voir count).
+# Mémoire : résidente à la fin de l'étape et écart depuis son début (processus entier : les étapes
+# d'autres pages menées en même temps y comptent aussi)
+@contextmanager
+def stage(name, page=None):
+    record = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "page": page or getattr(_local, "page", None) or "-",
+        "stage": name,
+        "rows": None,
+        "retries": 0,
+    }
+    start = time.monotonic()
+    rss_before = rss_mb()
+    previous = getattr(_local, "stage", None)
+    _local.stage = record
+    try:
+        yield record
+        record["ok"] = True
+    except BaseException:
+        record["ok"] = False
+        raise
+    finally:
+        _local.stage = previous
+        record["seconds"] = round(time.monotonic() - start, 4)
+        record["rss_mb"] = rss_mb()
+        record["rss_delta_mb"] = None if rss_before is None else round(record["rss_mb"] - rss_before, 1)
+        with _lock:
+            records.append(record)
+        _log(record)
+
+
+# Ajoute value au compteur record[key][name] de l'étape en cours du thread (sans étape en cours : ignoré)
+def count(key, name, value):
+    record = getattr(_local, "stage", None)
+    if record is not None:
+        counts = record.setdefault(key, {})
+        counts[name] = counts.get(name, 0) + value
+
+
+# Étapes mesurées dans un autre processus (navigateur isolé), rattachées à la page courante du thread
+def extend(worker_records):
+    for record in worker_records:
+        record["page"] = getattr(_local, "page", None) or record["page"]
+        with _lock:
+            records.append(record)
+        _log(record)
+
+
+# Totaux par (page, étape) : secondes, lignes, tentatives supplémentaires, étapes en échec, plus forte
+# hausse de mémoire résidente (Mo, None si non mesurée)
+def totals():
+    result = {}
+    with _lock:
+        snapshot = list(records)
+    for record in snapshot:
+        total = result.setdefault((record["page"], record["stage"]),
+                                  {"seconds": 0.0, "rows": 0, "retries": 0, "failures": 0,
+                                   "rss_delta_mb": None})
+        total["seconds"] += record["seconds"]
+        total["rows"] += record["rows"] or 0
+        total["retries"] += record["retries"]
+        total["failures"] += 0 if record["ok"] else 1
+        delta = record.get("rss_delta_mb")
+        if delta is not None:
+            total["rss_delta_mb"] = delta if total["rss_delta_mb"] is None else max(total["rss_delta_mb"], delta)
+    return result
+
+
+def summary():
+    by_page = {}
+    for (page_name, stage_name), total in totals().items():
+        by_page.setdefault(page_name, {})[stage_name] = total
+    lines = [f"📊 Bilan du run ({time.monotonic() - _run_start:.2f}s, pic mémoire {max_rss_mb()} Mo)"]
+    for page_name, stages in sorted(by_page.items()):
+        parts = []
+        for stage_name in STAGES:
+            total = stages.get(stage_name)
+            if total is None:
+                continue
+            part = f"{stage_name} {total['seconds']:.2f}s"
+            if total["rows"]:
+                part += f" {total['rows']} l."
+            if total["rss_delta_mb"]:
+                part += f" {total['rss_delta_mb']:+.1f} Mo"
+            if total["retries"]:
+                part += f" {total['retries']} reprise(s)"
+            if total["failures"]:
+                part += " ❌"
+            parts.append(part)
+        lines.append(f"  {page_name:<15} " + " | ".join(parts))
+    return "\n".join(lines)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Format d'exposition texte de Prometheus (dernier run)
+def prometheus_text():
+    metrics = {
+        "seconds": ("brvm_scrapper_stage_seconds", "Durée de chaque étape par page (secondes)"),
+        "rows": ("brvm_scrapper_stage_rows", "Lignes traitées par étape et par page"),
+        "retries": ("brvm_scrapper_stage_retries", "Tentatives supplémentaires par étape et par page"),
+        "failures": ("brvm_scrapper_stage_failures", "Étapes en échec par page"),
+    }
+    by_stage = totals()
+    lines = []
+    for key, (metric, description) in metrics.items():
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} gauge"]
+        for (page_name, stage_name), total in sorted(by_stage.items()):
+            lines.append(f'{metric}{{page="{_label(page_name)}",stage="{_label(stage_name)}"}} {total[key]}')
+    lines += [
+        "# HELP brvm_scrapper_stage_rss_delta_bytes Hausse de mémoire résidente du processus pendant l'étape",
+        "# TYPE brvm_scrapper_stage_rss_delta_bytes gauge",
+    ]
+    for (page_name, stage_name), total in sorted(by_stage.items()):
+        if total["rss_delta_mb"] is not None:
+            labels = f'page="{_label(page_name)}",stage="{_label(stage_name)}"'
+            lines.append(f'brvm_scrapper_stage_rss_delta_bytes{{{labels}}} {int(total["rss_delta_mb"] * 1024 * 1024)}')
+    lines += [
+        "# HELP brvm_scrapper_run_seconds Durée totale du run (secondes)",
+        "# TYPE brvm_scrapper_run_seconds gauge",
+        f"brvm_scrapper_run_seconds {time.monotonic() - _run_start:.4f}",
+    ]
+    if resource is not None:
+        lines += [
+            "# HELP brvm_scrapper_max_rss_bytes Pic de mémoire résidente du processus",
+            "# TYPE brvm_scrapper_max_rss_bytes gauge",
+            f"brvm_scrapper_max_rss_bytes {int(max_rss_mb() * 1024 * 1024)}",
+        ]
+    lines += [
+        "# HELP brvm_scrapper_last_run_timestamp_seconds Fin du dernier run (epoch)",
+        "# TYPE brvm_scrapper_last_run_timestamp_seconds gauge",
+        f"brvm_scrapper_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+# Écrit le textfile et/ou pousse vers la Pushgateway si configurés ; n'interrompt jamais le run
+def export():
+    if not (METRICS_TEXTFILE or METRICS_PUSHGATEWAY):
+        return
+    text = prometheus_text()
+    if METRICS_TEXTFILE:
+        try:
+            tmp_path = f"{METRICS_TEXTFILE}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            # Remplacement atomique : node_exporter ne lit jamais un fichier à moitié écrit
+            os.replace(tmp_path, METRICS_TEXTFILE)
+        except OSError as e:
+            print(f"⚠️ Écriture des métriques impossible ({e})")
+    if METRICS_PUSHGATEWAY:
+        import requests
+
+        try:
+            requests.put(
+                f"{METRICS_PUSHGATEWAY.rstrip('/')}/metrics/job/{METRICS_JOB}",
+                data=text.encode("utf-8"),
+                headers={"Content-Type": "text/plain; version=0.0.4"},
+                timeout=10,
+            ).raise_for_status()
+        except requests.RequestException as e:
+            print(f"⚠️ Envoi des métriques à la Pushgateway impossible ({e})")
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from . import metrics
+
+# Valeurs affichées par le site quand il n'y a pas de donnée
+PLACEHOLDERS = ["", "-", "--", "—", "N/A", "n/a", "NA", "ND", "nd", "n.d."]
+
+# Séparateurs de milliers : espaces, espaces insécables (\xa0,  ) et apostrophes
+THOUSANDS = r"[\s\xa0 ']"
+
+
+def _clean_text(values):
+    text = values.astype(object).where(values.notna(), None).astype("string")
+    text = (text
+            .str.replace(THOUSANDS, "", regex=True)
+            .str.replace("%", "", regex=False)
+            .str.replace("−", "-", regex=False))
+    # Le dernier séparateur est la décimale : "1 234,5" et "1.234,5" -> 1234.5, "1,234.5" -> 1234.5
+    comma_decimal = (text.str.rfind(",") > text.str.rfind(".")).fillna(False)
+    return text.where(
+        ~comma_decimal,
+        text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    ).where(comma_decimal, text.str.replace(",", "", regex=False))
+
+
+# Conversion vectorisée d'une colonne de texte (format français ou anglais) en nombres
+def to_number(values, dtype="float64", name=None):
+    name = name or values.name
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(dtype)
+
+    text = _clean_text(values)
+    missing = text.isna() | text.isin(PLACEHOLDERS)
+    numbers = pd.to_numeric(text.mask(missing).astype(object), errors="coerce").astype("float64")
+    failed = numbers.isna() & ~missing
+    if dtype == "Int64":
+        fractional = numbers.notna() & (numbers % 1 != 0)
+        numbers = numbers.mask(fractional)
+        failed |= fractional
+
+    failures = int(failed.sum())
+    if failures:
+        # Comptées par colonne dans l'étape en cours (normalize), donc dans les métriques et le rapport du run
+        metrics.count("coercion_failures", name, failures)
+        print(f"⚠️ {name} : {failures} valeur(s) non numérique(s) remplacée(s) par NULL")
+    return numbers.astype(dtype)
+
+
+# Applique to_number à plusieurs colonnes : {colonne: dtype}
+def numeric_columns(df, dtypes):
+    for col, dtype in dtypes.items():
+        df[col] = to_number(df[col], dtype, name=col)
+    return df
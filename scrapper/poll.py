@@ -0,0 +1,117 @@
+import os
+import signal
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from . import PAGES, cache, fetcher, scraper
+from .workers import browser_pool
+
+# Mode démon : surveille le marqueur "Last update" et ne relance le scraping complet que s'il bouge
+
+# Pages affichant "Last update"
+MARKER_PAGES = ("capitalisation", "volume")
+
+# Séance BRVM en UTC (Abidjan), du lundi au vendredi ; la fermeture inclut la publication des cours
+MARKET_OPEN = os.getenv("MARKET_OPEN", "09:00")
+MARKET_CLOSE = os.getenv("MARKET_CLOSE", "16:00")
+
+# Intervalle de contrôle en séance : minimal après un changement, doublé à chaque contrôle sans changement
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "60"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "600"))
+
+# Hors séance : au plus un contrôle par POLL_IDLE_INTERVAL, et un dès l'ouverture
+POLL_IDLE_INTERVAL = float(os.getenv("POLL_IDLE_INTERVAL", "3600"))
+
+# Durée maximale d'un contrôle (secondes)
+POLL_TIMEOUT = 60
+
+# Dernier marqueur retenu par page
+_markers = {}
+
+
+def _clock(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def market_open(now):
+    minutes = now.hour * 60 + now.minute
+    return now.weekday() < 5 and _clock(MARKET_OPEN) <= minutes < _clock(MARKET_CLOSE)
+
+
+def seconds_until_open(now):
+    opening = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=_clock(MARKET_OPEN))
+    while opening <= now or opening.weekday() >= 5:
+        opening += timedelta(days=1)
+    return (opening - now).total_seconds()
+
+
+# Prochain intervalle : court après un changement, croissant sans changement, long hors séance
+def next_interval(interval, changed, now):
+    if not market_open(now):
+        return max(min(POLL_IDLE_INTERVAL, seconds_until_open(now)), POLL_MIN_INTERVAL)
+    if changed:
+        return POLL_MIN_INTERVAL
+    return min(max(interval, POLL_MIN_INTERVAL) * 2, POLL_MAX_INTERVAL)
+
+
+# Marqueur "Last update" d'une page : requête conditionnelle (validateurs du cache de pages) sur la
+# session HTTP gardée ouverte, navigateur du pool si la page n'est pas lisible en HTTP.
+# La page lue reste en cache, fraîche, sans être archivée : le run déclenché la réutilise (et l'archive)
+def read_marker(name, pool):
+    module = scraper(name)
+    if fetcher.BACKEND == "http":
+        cached = cache.get(module.URL)
+        html = fetcher.fetch_html(module.URL, cached if cached and cached.source == "http" else None, archive=False)
+        marker = fetcher.last_update_text(fetcher.parse_html(html))
+        if marker != fetcher.UNKNOWN_UPDATE:
+            return marker
+    with fetcher.polite(module.URL):
+        (_, marker), html = pool.scrape(module.URL, module.scrape_selenium)
+    cache.put(module.URL, html, source="selenium", archived=False)
+    return marker
+
+
+def add_arguments(parser):
+    parser.add_argument("--pages", nargs="+", choices=PAGES, default=PAGES,
+                        help="pages scrapées quand le marqueur change (toutes par défaut)")
+    parser.add_argument("--once", action="store_true", help="un seul contrôle, puis sortie")
+
+
+def run(args):
+    from .main import POOL_SIZE, run as run_pages
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    interval = POLL_MIN_INTERVAL
+    errors = 0
+    # Un seul pool de navigateurs (lancés au premier besoin) et une seule session HTTP pour tout le démon
+    with browser_pool(size=POOL_SIZE) as pool:
+        while not stop.is_set():
+            changed = False
+            try:
+                fetcher.start_deadline(POLL_TIMEOUT)
+                started = time.time()
+                markers = {name: read_marker(name, pool) for name in MARKER_PAGES}
+                changed = markers != _markers
+                if changed:
+                    print(f"🔔 Nouvelle mise à jour : {', '.join(f'{k} = {v}' for k, v in markers.items())}")
+                    # Pages qui viennent d'être relues réutilisées telles quelles ; les autres copies en cache
+                    # sont antérieures à la mise à jour et revalidées avant d'être réutilisées
+                    cache.expire(started)
+                    errors = run_pages(args.pages, pool=pool)
+                    # Pages en erreur : le marqueur n'est pas retenu, le prochain contrôle relancera le scraping
+                    if not errors:
+                        _markers.update(markers)
+            except Exception as e:
+                errors = 1
+                print(f"🔴 Contrôle du marqueur impossible : {e}")
+            if args.once:
+                break
+            interval = next_interval(interval, changed, datetime.now(timezone.utc))
+            print(f"💤 Prochain contrôle dans {interval:.0f}s")
+            stop.wait(interval)
+    return 1 if errors else 0
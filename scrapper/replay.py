@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from . import PAGES, archive, fetcher, scraper, stream
+from .main import save
+
+# Page correspondant à chaque URL archivée
+PAGE_BY_URL = {scraper(name).URL: name for name in PAGES}
+
+
+# Reparse une page archivée (exécuté dans un processus du pool) ; pas de navigateur ni de réseau
+def parse_entry(entry):
+    module = scraper(PAGE_BY_URL[entry["url"]])
+    try:
+        doc = fetcher.parse_html(archive.load_page(entry["sha256"]))
+        as_of = datetime.fromisoformat(entry["fetched_at"]).replace(tzinfo=None)
+        df = module.parse(module.CELLS(doc), fetcher.last_update_text(doc), as_of=as_of)
+        return entry, df, None
+    except Exception as e:
+        return entry, None, f"{type(e).__name__}: {e}"
+
+
+# Mode flux : le processus du pool lit l'archive au fil de l'eau et écrit la page en base par blocs,
+# sans texte, arbre lxml ni DataFrame complets
+def stream_entry(entry):
+    module = scraper(PAGE_BY_URL[entry["url"]])
+    try:
+        as_of = datetime.fromisoformat(entry["fetched_at"]).replace(tzinfo=None)
+        with archive.open_page(entry["sha256"]) as f:
+            return entry, stream.load_source(module, f, as_of), None
+    except Exception as e:
+        return entry, None, f"{type(e).__name__}: {e}"
+
+
+def add_arguments(parser):
+    parser.add_argument("--pages", nargs="+", choices=PAGES,
+                        help="pages à rejouer (toutes par défaut)")
+    parser.add_argument("--since", help="première date de récupération (YYYY-MM-DD)")
+    parser.add_argument("--until", help="dernière date de récupération (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processus de parsing")
+    parser.add_argument("--write", action="store_true", help="écrire les tables reconstruites en base et dans l'historique Parquet")
+    parser.add_argument("--stream", action="store_true",
+                        help=f"écrire en base par blocs de STREAM_CHUNK_ROWS lignes ({stream.STREAM_CHUNK_ROWS}), "
+                             "mémoire constante, sans historique Parquet")
+
+
+def run(args):
+    urls = {url for url, name in PAGE_BY_URL.items() if not args.pages or name in args.pages}
+    entries = list(archive.entries(urls, args.since, args.until))
+    print(f"🟢 {len(entries)} page(s) archivée(s) à rejouer")
+
+    errors = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        if args.stream:
+            for entry, result, error in executor.map(stream_entry, entries, chunksize=16):
+                name = PAGE_BY_URL[entry["url"]]
+                if error:
+                    errors += 1
+                    print(f"🔴 {name} {entry['fetched_at']} ({entry['sha256'][:12]}) : {error}")
+                else:
+                    print(f"✅ {name} {entry['fetched_at']} : {result.inserted} insérées, "
+                          f"{result.updated} mises à jour, {result.unchanged} inchangées")
+            return 1 if errors else 0
+        for entry, df, error in executor.map(parse_entry, entries, chunksize=16):
+            name = PAGE_BY_URL[entry["url"]]
+            if error:
+                errors += 1
+                print(f"🔴 {name} {entry['fetched_at']} ({entry['sha256'][:12]}) : {error}")
+            elif args.write:
+                save(name, df, datetime.fromisoformat(entry["fetched_at"]).replace(tzinfo=None), publish=False)
+            else:
+                print(f"✅ {name} {entry['fetched_at']} : {len(df)} lignes")
+    return 1 if errors else 0
@@ -0,0 +1,88 @@
+from collections import namedtuple
+
+from . import db
+
+# Schémas déclarés des tables : colonnes (nom SQL = nom dans le DataFrame), types compacts,
+# colonnes obligatoires et dérivation de la clé "id". Chaque transform se termine par conform()
+
+# Types : symboles et libellés en category, entiers Int64, montants float64, dates date32 (pyarrow)
+CATEGORY = "category"
+INT = "Int64"
+FLOAT = "float64"
+DATE = "date32"
+TEXT = "text"
+
+# Colonne d'une table ; nullable=False : une ligne sans valeur est rejetée avant l'écriture
+Column = namedtuple("Column", ["name", "dtype", "nullable"], defaults=[True])
+
+# Table : nom, colonnes dans l'ordre, fonction DataFrame -> Series de la clé "id", et colonnes
+# identifiant un titre d'un run à l'autre (flux de changements)
+Schema = namedtuple("Schema", ["table", "columns", "key", "entity"], defaults=[None])
+
+KEY = "id"
+
+
+# Clé formée de colonnes jointes par un séparateur (dates au format YYYY-MM-DD)
+def join_key(*names, separator="-"):
+    def key(df):
+        parts = [df[name].astype(object).astype(str) for name in names]
+        joined = parts[0]
+        for part in parts[1:]:
+            joined = joined + separator + part
+        return joined
+
+    return key
+
+
+# Spec d'écriture : chaque colonne SQL porte le même nom dans le DataFrame
+def spec(schema, ddl=None):
+    return db.TableSpec(schema.table, KEY, {KEY: KEY, **{col.name: col.name for col in schema.columns}}, ddl)
+
+
+def _dates(values):
+    import pandas as pd
+
+    dates = pd.to_datetime(values, errors="coerce")
+    try:
+        return dates.astype("date32[pyarrow]")
+    except ImportError:
+        # Sans pyarrow : dates Python (datetime.date) en colonne object
+        return dates.dt.date.astype(object).where(dates.notna(), None)
+
+
+def _text(values):
+    text = values.astype("string").str.strip()
+    return text.mask(text == "")
+
+
+# Conversion au type déclaré ; les chaînes vides deviennent des valeurs manquantes
+def _convert(values, dtype):
+    if dtype == DATE:
+        return _dates(values)
+    if dtype == CATEGORY:
+        return _text(values).astype(CATEGORY)
+    if dtype == TEXT:
+        return _text(values).astype(object)
+    return values.astype(dtype)
+
+
+# Met le DataFrame au schéma, une seule fois en fin de transform : colonnes typées dans l'ordre
+# déclaré, lignes incomplètes rejetées (avec un avertissement), puis clé dérivée en tête
+def conform(df, schema):
+    import pandas as pd
+
+    frame = pd.DataFrame({col.name: _convert(df[col.name], col.dtype) for col in schema.columns})
+    required = [col.name for col in schema.columns if not col.nullable]
+    missing = frame[required].isna()
+    rejected = missing.any(axis=1)
+    if rejected.any():
+        counts = missing.sum()
+        detail = ", ".join(f"{name} : {int(counts[name])}" for name in required if counts[name])
+        print(f"⚠️ {schema.table} : {int(rejected.sum())} ligne(s) rejetée(s), valeur manquante ({detail})")
+        frame = frame[~rejected].reset_index(drop=True)
+        # Catégories devenues inutiles après le rejet
+        for col in schema.columns:
+            if col.dtype == CATEGORY:
+                frame[col.name] = frame[col.name].cat.remove_unused_categories()
+    frame.insert(0, KEY, schema.key(frame).astype(object))
+    return frame
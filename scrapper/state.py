@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+# Points de reprise du run : état de chaque page et données déjà récupérées ou parsées
+STATE_DIR = os.getenv("RUN_STATE_DIR", ".run_state")
+
+# Un run interrompu plus ancien (secondes) n'est pas repris : ses pages seraient périmées
+RESUME_MAX_AGE = float(os.getenv("RESUME_MAX_AGE", str(6 * 3600)))
+
+# Étapes d'une page, dans l'ordre
+PENDING, FETCHED, PARSED, WRITTEN = "pending", "fetched", "parsed", "written"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class RunState:
+    """État du run dans STATE_DIR/state.json, réécrit atomiquement à chaque transition."""
+
+    def __init__(self, pages, resume=False, directory=STATE_DIR):
+        self.directory = directory
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        previous = self._load() if resume else None
+        if previous and self._resumable(previous, pages):
+            self.data = previous
+            self.data["resumed_at"] = _now().isoformat()
+            self.resumed = True
+        else:
+            self.data = {
+                "run_id": _now().strftime("%Y%m%dT%H%M%S"),
+                "started_at": _now().isoformat(),
+                "finished_at": None,
+                "pages": {name: {"stage": PENDING, "failed_attempts": {}, "error": None, "rows": None} for name in pages},
+            }
+            self.resumed = False
+            self._clear_checkpoints()
+        self.save()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, "state.json")
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _resumable(self, previous, pages):
+        age = (_now() - datetime.fromisoformat(previous["started_at"])).total_seconds()
+        unfinished = any(page["stage"] != WRITTEN for page in previous["pages"].values())
+        return unfinished and age <= RESUME_MAX_AGE and set(pages) <= set(previous["pages"])
+
+    def _checkpoint(self, name, suffix):
+        return os.path.join(self.directory, f"{name}.{suffix}")
+
+    def _clear_checkpoints(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith((".cells.json", ".parsed.pkl")):
+                os.remove(os.path.join(self.directory, filename))
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def page(self, name):
+        return self.data["pages"][name]
+
+    def stage(self, name):
+        return self.page(name)["stage"]
+
+    def attempt(self, name, stage, error=None):
+        with self._lock:
+            page = self.page(name)
+            page["failed_attempts"][stage] = page["failed_attempts"].get(stage, 0) + 1
+            page["error"] = error
+            self.save()
+
+    def _advance(self, name, stage, rows=None, **fields):
+        with self._lock:
+            page = self.page(name)
+            page.update(stage=stage, error=None, updated_at=_now().isoformat(), **fields)
+            if rows is not None:
+                page["rows"] = rows
+            self.save()
+
+    # Date de récupération de la page (naïve) : sert de as_of quand le run est repris plus tard
+    def as_of(self, name):
+        fetched_at = self.page(name).get("fetched_at")
+        return datetime.fromisoformat(fetched_at).replace(tzinfo=None) if fetched_at else None
+
+    def fetched(self, name, cells, last_update_text):
+        with open(self._checkpoint(name, "cells.json"), "w", encoding="utf-8") as f:
+            json.dump({"last_update": last_update_text, "cells": cells}, f, ensure_ascii=False)
+        self._advance(name, FETCHED, len(cells), fetched_at=_now().isoformat())
+
+    def load_cells(self, name):
+        with open(self._checkpoint(name, "cells.json"), encoding="utf-8") as f:
+            saved = json.load(f)
+        return saved["cells"], saved["last_update"]
+
+    # coercion_failures : valeurs non numériques remplacées par NULL, par colonne
+    def parsed(self, name, df, coercion_failures=None):
+        df.to_pickle(self._checkpoint(name, "parsed.pkl"))
+        self._advance(name, PARSED, len(df), coercion_failures=coercion_failures or {})
+
+    def load_frame(self, name):
+        import pandas as pd
+
+        return pd.read_pickle(self._checkpoint(name, "parsed.pkl"))
+
+    def written(self, name):
+        self._advance(name, WRITTEN)
+        for suffix in ("cells.json", "parsed.pkl"):
+            if os.path.exists(self._checkpoint(name, suffix)):
+                os.remove(self._checkpoint(name, suffix))
+
+    def failed(self, name, error):
+        with self._lock:
+            self.page(name)["error"] = error
+            self.save()
+
+    # Rapport lisible par machine : état final de chaque page et code de sortie
+    def finish(self):
+        with self._lock:
+            self.data["finished_at"] = _now().isoformat()
+            failed = sorted(name for name, page in self.data["pages"].items() if page["stage"] != WRITTEN)
+            self.data["status"] = "failed" if failed else "ok"
+            self.data["failed_pages"] = failed
+            self.save()
+            return self.data
@@ -0,0 +1,53 @@
+import os
+from itertools import chain, islice
+
+from . import db, fetcher
+
+# Mode flux : les lignes passent de la lecture du HTML au parsing puis à la base par blocs de taille fixe,
+# la mémoire ne dépend plus de la taille de la table
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "2000"))
+
+
+def chunks(rows, size=STREAM_CHUNK_ROWS):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# DataFrames successifs, identiques bout à bout à module.parse(cells, ...) : les transformations
+# sont ligne à ligne et la date de mise à jour vient de la page, pas des autres lignes
+def parse_chunks(module, cells, last_update_text, as_of=None, size=STREAM_CHUNK_ROWS):
+    for chunk in chunks(cells, size):
+        yield module.parse(chunk, last_update_text, as_of=as_of)
+
+
+# Écrit chaque bloc dès qu'il est prêt ; renvoie le bilan cumulé
+def load_chunks(module, frames):
+    total = db.WriteResult(0, 0, 0)
+    for df in frames:
+        # Écriture partielle : l'empreinte globale de la table n'a pas de sens bloc par bloc
+        result = module.load(df, snapshot=False)
+        total = db.WriteResult(*(a + b for a, b in zip(total, result)))
+    return total
+
+
+# (texte "Last update", cellules au fil de l'analyse) d'une page lue par module.STREAM_CELLS.
+# Le texte précède le tableau sur le site : les lignes vues avant lui (aucune en pratique, toute la
+# page des indices qui n'en a pas) sont gardées jusqu'à ce qu'il soit trouvé
+def read_source(module, source):
+    events = module.STREAM_CELLS(source)
+    pending = []
+    for kind, value in events:
+        if kind == fetcher.LAST_UPDATE:
+            return value, chain(pending, (value for kind, value in events if kind == fetcher.ROW))
+        pending.append(value)
+    return fetcher.UNKNOWN_UPDATE, iter(pending)
+
+
+# Page HTML (fichier ou archive ouverts en binaire) -> base, bloc par bloc, sans la charger en entier
+def load_source(module, source, as_of=None, size=STREAM_CHUNK_ROWS):
+    last_update_text, cells = read_source(module, source)
+    return load_chunks(module, parse_chunks(module, cells, last_update_text, as_of, size))
@@ -1,125 +1,122 @@
-import os
-import time
 import re
-import pandas as pd
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from sqlalchemy import create_engine, text
-import os
-from dotenv import load_dotenv
-# Charger les variables d'environnement
-load_dotenv()
-
-# Créer l'engine pour la base PostgreSQL
-target_postgres_engine = create_engine(
-    f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@"
-    f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-)
-options = Options()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-
-CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", "/usr/lib/chromium/chromedriver")
-
-driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+from . import db, fetcher, schema
 
 # URL à scraper
-url = "https://www.brvm.org/en/volumes/0"
-driver.get(url)
-time.sleep(7)
+URL = "https://www.brvm.org/en/volumes/0"
+
+
+# Délai maximal de chargement de la page (secondes)
+PAGE_TIMEOUT = 20
+
+# Date de mise à jour indispensable : la clé des lignes en dépend (voir fetcher.scrape_page)
+REQUIRE_LAST_UPDATE = True
+
+
+def scrape_selenium(driver, url=URL):
+    from . import browser
+
+    # Attente d'un tableau stable et de la date de mise à jour, puis lecture en un seul appel
+    cells, last_update_text = browser.load_table(
+        driver, url, fetcher.budget(PAGE_TIMEOUT), require_last_update=REQUIRE_LAST_UPDATE
+    )
+    return cells, last_update_text or fetcher.UNKNOWN_UPDATE
 
-# Récupération de la date de mise à jour
-try:
-    last_update_elem = driver.find_element(By.XPATH, "//*[contains(text(),'Last update')]")
-    last_update_text = last_update_elem.text.strip()
-except:
-    last_update_text = "Unknown update date"
 
 # Parsing de la date
-update_date = None
-date_match = re.search(r"Last update:\s*(.*)", last_update_text)
-if date_match:
-    update_date = date_match.group(1)
-
-# Récupération des lignes du tableau
-rows = driver.find_elements(By.CSS_SELECTOR, "table.table tbody tr")
-print(f"Found {len(rows)} rows")
-
-data = []
-for row in rows:
-    cols = row.find_elements(By.TAG_NAME, "td")
-    if len(cols) >= 6:
-        symbol = cols[0].text.strip()
-        name = cols[1].text.strip()
-        number_of_transactions = cols[2].text.strip().replace('\xa0', '').replace(' ', '')
-        traded_value = cols[3].text.strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
-        per = cols[4].text.strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
-        percent_global_value = cols[5].text.strip().replace('%', '').replace(',', '.')
-        data.append([
-            symbol, name, number_of_transactions, traded_value, per, percent_global_value
-        ])
-
-driver.quit()
-
-# Transformation en DataFrame
-df = pd.DataFrame(data, columns=[
-    "SYMBOL", "NAME", "NUMBER_OF_TRANSACTIONS", "TRADED_VALUE", "PER", "PERCENT_GLOBAL_TRADED_VALUE"
-])
-
-# Conversion des colonnes numériques
-for col in ["NUMBER_OF_TRANSACTIONS", "TRADED_VALUE", "PER", "PERCENT_GLOBAL_TRADED_VALUE"]:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-df["UPDATE_DATE"] = update_date
+def parse_update_date(last_update_text):
+    date_match = re.search(r"Last update:\s*(.*)", last_update_text)
+    if date_match:
+        return date_match.group(1)
+    return None
+
+
+def parse_rows(cells):
+    # Lignes complètes uniquement ; les nombres sont nettoyés colonne par colonne dans transform
+    return [cols[:6] for cols in cells if len(cols) >= 6]
+
+
+# Extraction des cellules depuis le HTML (pages en direct ou archivées)
+CELLS = fetcher.body_cells
+STREAM_CELLS = fetcher.stream_body_cells
+
+
+# Récupération seule (HTTP, Selenium en secours) : aucun import de pandas ni accès à la base
+def fetch(pool=None):
+    return fetcher.scrape_page(URL, pool, scrape_selenium, extract=CELLS,
+                               require_last_update=REQUIRE_LAST_UPDATE)
+
 
 def parse_date(date_str):
+    import pandas as pd
+
     try:
         date_part = date_str.split('-', 1)[0].strip()
         return datetime.strptime(date_part, '%A, %d %B, %Y').date()
     except:
         return pd.NaT
 
-df['UPDATE_DATE'] = df['UPDATE_DATE'].apply(parse_date)
-if df['UPDATE_DATE'].isna().any():
-    df['UPDATE_DATE'] = df['UPDATE_DATE'].fillna(df['UPDATE_DATE'].mode()[0])
-
-df['ID'] = df['NAME'] + df['UPDATE_DATE'].astype(str)
-
-# Insertion dans PostgreSQL
-with target_postgres_engine.begin() as connection:
-    for _, row in df.iterrows():
-        connection.execute(
-            text("""
-                INSERT INTO volumes (
-                    id, symbol, name, number_of_transactions, 
-                    traded_value, per, percent_global_traded_value, update_date
-                ) VALUES (
-                    :id, :symbol, :name, :number_of_transactions, 
-                    :traded_value, :per, :percent_global_traded_value, :update_date
-                )
-                ON CONFLICT (id) DO UPDATE SET
-                    symbol = EXCLUDED.symbol,
-                    name = EXCLUDED.name,
-                    number_of_transactions = EXCLUDED.number_of_transactions,
-                    traded_value = EXCLUDED.traded_value,
-                    per = EXCLUDED.per,
-                    percent_global_traded_value = EXCLUDED.percent_global_traded_value,
-                    update_date = EXCLUDED.update_date
-            """),
-            {
-                'id': row['ID'],
-                'symbol': row['SYMBOL'],
-                'name': row['NAME'],
-                'number_of_transactions': row['NUMBER_OF_TRANSACTIONS'],
-                'traded_value': row['TRADED_VALUE'],
-                'per': row['PER'],
-                'percent_global_traded_value': row['PERCENT_GLOBAL_TRADED_VALUE'],
-                'update_date': row['UPDATE_DATE']
-            }
-        )
-
-print("✅ Volume data successfully inserted into 'volumes' table.")
+
+# Table volumes : colonnes et types, clé "<nom><update_date>"
+SCHEMA = schema.Schema("volumes", (
+    schema.Column("symbol", schema.CATEGORY),
+    schema.Column("name", schema.CATEGORY, nullable=False),
+    schema.Column("number_of_transactions", schema.INT),
+    schema.Column("traded_value", schema.FLOAT),
+    schema.Column("per", schema.FLOAT),
+    schema.Column("percent_global_traded_value", schema.FLOAT),
+    schema.Column("update_date", schema.DATE, nullable=False),
+), schema.join_key("name", "update_date", separator=""), entity=("symbol",))
+
+SPEC = schema.spec(SCHEMA)
+
+
+def transform(data, update_date):
+    import pandas as pd
+    from . import normalize
+
+    # Transformation en DataFrame, colonnes nommées comme dans la table
+    df = pd.DataFrame(data, columns=[
+        "symbol", "name", "number_of_transactions", "traded_value", "per", "percent_global_traded_value"
+    ])
+
+    # Conversion des colonnes numériques
+    df = normalize.numeric_columns(df, {
+        "number_of_transactions": "Int64",
+        "traded_value": "float64",
+        "per": "float64",
+        "percent_global_traded_value": "float64"
+    })
+
+    # Même date pour toutes les lignes, lue une fois. Illisible, la page échoue (et sera retentée) :
+    # sinon toutes les lignes seraient rejetées par le schéma sans erreur
+    date = parse_date(update_date)
+    if pd.isna(date):
+        raise ValueError(f"Date de mise à jour illisible sur la page des volumes : {update_date!r}")
+    df["update_date"] = date
+    return schema.conform(df, SCHEMA)
+
+
+def load(df, **options):
+    # Insertion dans PostgreSQL
+    return db.upsert(db.engine(), df, SPEC, **options)
+
+
+# Cellules brutes -> DataFrame prêt à écrire ; la date vient toujours de la page
+def parse(cells, last_update_text, as_of=None):
+    return transform(parse_rows(cells), parse_update_date(last_update_text))
+
+
+def extract(pool=None):
+    cells, last_update_text = fetch(pool)
+    print(f"Found {len(cells)} rows")
+    return parse(cells, last_update_text)
+
+
+def save(df):
+    inserted, updated, unchanged = load(df)
+    print(f"✅ Volume data successfully inserted into 'volumes' table ({inserted} inserted, {updated} updated, {unchanged} unchanged).")
+
+
+def run(pool=None):
+    save(extract(pool))
@@ -0,0 +1,268 @@
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+from . import fetcher, metrics
+
+# Navigateurs : "process" (chaque Chromium dans un processus superviseur dédié, tué et remplacé s'il
+# bloque ou grossit) ou "thread" (drivers dans le processus du scraper, voir browser.BrowserPool)
+BROWSER_POOL = os.getenv("BROWSER_POOL", "process")
+
+# Recyclage d'un processus navigateur : après WORKER_MAX_PAGES pages, ou quand la mémoire résidente
+# de tout son arbre (processus, chromedriver, Chromium) dépasse WORKER_MAX_RSS_MB
+WORKER_MAX_PAGES = int(os.getenv("WORKER_MAX_PAGES", "50"))
+WORKER_MAX_RSS_MB = float(os.getenv("WORKER_MAX_RSS_MB", "1024"))
+
+# Délai maximal d'une page dans un navigateur (borné par l'échéance du run), plus la marge laissée
+# au démarrage de Chromium avant que le chien de garde ne tue le processus
+WORKER_TASK_TIMEOUT = float(os.getenv("WORKER_TASK_TIMEOUT", "120"))
+WORKER_STARTUP_GRACE = float(os.getenv("WORKER_STARTUP_GRACE", "15"))
+
+# Chaque processus navigateur épinglé sur un cœur, à tour de rôle (Linux). Chromedriver et Chromium héritent
+# du cœur : seulement avec plusieurs navigateurs et au moins un cœur pour chacun
+WORKER_PIN_CPUS = os.getenv("WORKER_PIN_CPUS", "1") != "0"
+
+# Intervalle de contrôle de la mémoire pendant une page
+WORKER_POLL = 1.0
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class WorkerTimeout(WorkerError):
+    pass
+
+
+# Mémoire résidente (Mo) des processus de la session du processus navigateur ; None hors Linux
+def tree_rss_mb(session):
+    if not os.path.isdir("/proc"):
+        return None
+    total = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as f:
+                # Champs après "pid (commande)" : état, ppid, pgrp, session, ..., rss (en pages)
+                fields = f.read().rsplit(b")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[3]) == session:
+            total += int(fields[21])
+    return round(total * _PAGE_SIZE / 1024 / 1024, 1)
+
+
+# Boucle d'un processus navigateur : profil Chrome à lui, driver lancé à la première page,
+# une tâche (url, fonction, délai) à la fois ; s'arrête après max_pages pages ou une erreur
+def _worker_main(conn, profile_dir, max_pages, cpu):
+    from . import browser
+
+    # Session à part : le superviseur tue d'un coup le processus, chromedriver et Chromium
+    if hasattr(os, "setsid"):
+        os.setsid()
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    # Les étapes sont renvoyées au superviseur, qui les journalise
+    metrics.METRICS_LOG = ""
+    driver = None
+    try:
+        for pages in range(1, max_pages + 1):
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            url, function, timeout = task
+            fetcher.start_deadline(timeout)
+            metrics.reset()
+            try:
+                if driver is None:
+                    with metrics.stage("startup"):
+                        driver = browser.create_driver(profile_dir)
+                reply = (True, (function(driver, url), driver.page_source))
+            except Exception as e:
+                reply = (False, f"{type(e).__name__}: {e}")
+            conn.send(reply + (list(metrics.records),))
+            if not reply[0]:
+                break
+    finally:
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class _Worker:
+    def __init__(self, context, max_pages, cpu):
+        # Profil temporaire créé et supprimé par le superviseur (même si le processus est tué)
+        self.profile_dir = tempfile.mkdtemp(prefix="brvm-chrome-")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, self.profile_dir, max_pages, cpu),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.max_pages = max_pages
+        self.pages = 0
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        # Tout le groupe (chromedriver et Chromium compris) ; processus seul si le groupe n'existe pas encore
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (OSError, AttributeError):
+            self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def stop(self, timeout=10):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class WorkerPool:
+    """Pool supervisé de processus navigateurs isolés, même interface que browser.BrowserPool."""
+
+    def __init__(self, size=1, max_pages=WORKER_MAX_PAGES, max_rss_mb=WORKER_MAX_RSS_MB,
+                 task_timeout=WORKER_TASK_TIMEOUT):
+        self.size = max(1, int(size))
+        self.max_pages = max(1, int(max_pages))
+        self.max_rss_mb = max_rss_mb
+        self.task_timeout = task_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._started = 0
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self._cpus = cpus if WORKER_PIN_CPUS and 1 < self.size <= len(cpus) else []
+
+    def _start(self):
+        cpu = self._cpus[self._started % len(self._cpus)] if self._cpus else None
+        self._started += 1
+        worker = _Worker(self._context, self.max_pages, cpu)
+        self._workers.append(worker)
+        return worker
+
+    def acquire(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = None
+            if worker is not None:
+                if worker.alive():
+                    return worker
+                self.discard(worker)
+                continue
+            with self._lock:
+                if len(self._workers) < self.size:
+                    return self._start()
+            try:
+                worker = self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._idle.put(worker)
+
+    def release(self, worker):
+        self._idle.put(worker)
+
+    def discard(self, worker, kill=False):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+
+    def _over_memory(self, worker):
+        rss = tree_rss_mb(worker.process.pid)
+        return rss is not None and rss > self.max_rss_mb, rss
+
+    # Attend la réponse du processus ; le tue s'il dépasse le délai ou la mémoire autorisés
+    def _wait(self, worker, url, timeout):
+        limit = time.monotonic() + timeout + (WORKER_STARTUP_GRACE if worker.pages == 0 else 0)
+        while not worker.conn.poll(min(WORKER_POLL, max(limit - time.monotonic(), 0))):
+            over, rss = self._over_memory(worker)
+            if over:
+                self.discard(worker, kill=True)
+                raise WorkerError(f"Navigateur tué sur {url} : {rss:.0f} Mo > {self.max_rss_mb:.0f} Mo")
+            if time.monotonic() >= limit:
+                self.discard(worker, kill=True)
+                raise WorkerTimeout(f"Navigateur bloqué sur {url} depuis {timeout:.0f}s, processus tué")
+            if not worker.alive():
+                self.discard(worker, kill=True)
+                raise WorkerError(f"Processus navigateur arrêté sur {url} (code {worker.process.exitcode})")
+        try:
+            return worker.conn.recv()
+        except (EOFError, OSError):
+            self.discard(worker, kill=True)
+            raise WorkerError(f"Processus navigateur arrêté sur {url} (code {worker.process.exitcode})")
+
+    # Exécute function(driver, url) dans un processus navigateur ; renvoie (résultat, HTML rendu).
+    # function doit être une fonction de module (transmise par référence au processus)
+    def scrape(self, url, function, timeout=None):
+        timeout = fetcher.budget(self.task_timeout if timeout is None else timeout)
+        worker = self.acquire()
+        try:
+            worker.conn.send((url, function, timeout))
+        except OSError:
+            self.discard(worker, kill=True)
+            raise WorkerError(f"Processus navigateur indisponible pour {url}")
+        ok, value, records = self._wait(worker, url, timeout)
+        metrics.extend(records)
+        worker.pages += 1
+
+        # Recyclage : le processus s'arrête de lui-même après une erreur ou sa dernière page
+        over, rss = self._over_memory(worker)
+        if not ok or worker.pages >= worker.max_pages:
+            self.discard(worker)
+        elif over:
+            print(f"♻️ Navigateur recyclé : {rss:.0f} Mo > {self.max_rss_mb:.0f} Mo")
+            self.discard(worker)
+        else:
+            self.release(worker)
+        if not ok:
+            raise WorkerError(value)
+        return value
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Pool de navigateurs selon BROWSER_POOL, lancés au premier besoin
+def browser_pool(size=1):
+    if BROWSER_POOL == "thread":
+        from .browser import BrowserPool
+        return BrowserPool(size=size)
+    return WorkerPool(size=size)
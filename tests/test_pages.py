@@ -0,0 +1,124 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+from scrapper import fetcher, metrics, normalize, scraper, stream
+
+# Pages enregistrées (structure du site : table.table, cellules avec \xa0, ligne "Last update"),
+# lues sans réseau ni navigateur
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+LAST_UPDATE = "Last update: Friday, 17 October, 2025 - 15:00"
+
+# Lignes attendues : celles des anciennes boucles Selenium (texte des <td>, lignes incomplètes écartées)
+EXPECTED_ROWS = {
+    "bond": [
+        ["EOS.BOAD.2019", "BOAD 5,95% 2019-2029", "03/29/2019", "03/29/2029", "9\xa0950,00", "2,98",
+         "03/29/2025 / 595,00"],
+        ["EOM.TPCI.2021", "TPCI 5,80% 2021-2028", "11/05/2021", "11/05/2028", "10\xa0000,00", "4,66",
+         "11/05/2024 / 580,00"],
+        ["EOB.SENELEC.2022", "SENELEC 6,50% 2022-2029", "07/14/2022", "07/14/2029", "99,50", "1,71", ""],
+    ],
+    "capitalisation": [
+        ["ABJC", "SERVAIR ABIDJAN COTE D'IVOIRE", "10\xa0740\xa0000", "2\xa0010", "4\xa0317\xa0480\xa0000",
+         "21\xa0587\xa0400\xa0000", "0,11 %"],
+        ["SNTS", "SONATEL SENEGAL", "100\xa0000\xa0000", "25\xa0500", "663\xa0000\xa0000\xa0000",
+         "2\xa0550\xa0000\xa0000\xa0000", "13,27 %"],
+        ["SGBC", "SOCIETE GENERALE COTE D'IVOIRE", "31\xa0111\xa0110", "27\xa0995", "139\xa0377\xa0760\xa0000",
+         "870\xa0955\xa0524\xa0450", "4,53 %"],
+    ],
+    # Page des indices : la première ligne de chaque tableau (en-tête, <th>) est sautée
+    "index": [
+        ["BRVM COMPOSITE", "318,42", "320,11", "0,53 %", "15,94 %"],
+        ["BRVM 30", "158,09", "158,67", "0,37 %", "-1,02 %"],
+        ["BRVM - FINANCIAL SERVICES", "1\xa0104,77", "1\xa0110,31", "0,50 %", "12,08 %"],
+    ],
+    "volume": [
+        ["ABJC", "SERVAIR ABIDJAN COTE D'IVOIRE", "12", "1\xa0206\xa0000", "9,85", "0,08 %"],
+        ["SNTS", "SONATEL SENEGAL", "1\xa0284", "502\xa0350\xa0000", "11,2", "33,41 %"],
+        ["BICB", "BANQUE INTERNATIONALE POUR L'INDUSTRIE ET LE COMMERCE DU BENIN", "0", "0", "-", "0,00 %"],
+    ],
+}
+
+PAGES = sorted(EXPECTED_ROWS)
+
+
+def load(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.html"), encoding="utf-8") as f:
+        return fetcher.parse_html(f.read())
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_rows(name):
+    module = scraper(name)
+    assert module.parse_rows(module.CELLS(load(name))) == EXPECTED_ROWS[name]
+
+
+@pytest.mark.parametrize("name", PAGES)
+def test_stream_cells_matches_cells(name):
+    module = scraper(name)
+    with open(os.path.join(FIXTURES_DIR, f"{name}.html"), "rb") as f:
+        last_update_text, cells = stream.read_source(module, f)
+        assert list(cells) == module.CELLS(load(name))
+    assert last_update_text == fetcher.last_update_text(load(name))
+
+
+def test_last_update():
+    for name in ("bond", "capitalisation", "volume"):
+        assert fetcher.last_update_text(load(name)) == LAST_UPDATE
+    assert fetcher.last_update_text(load("index")) == fetcher.UNKNOWN_UPDATE
+
+
+# Les séparateurs de milliers \xa0 disparaissent à la normalisation
+def test_parse_numbers():
+    module = scraper("capitalisation")
+    doc = load("capitalisation")
+    df = module.parse(module.CELLS(doc), fetcher.last_update_text(doc))
+    first = df.iloc[0]
+    assert first["number_of_shares"] == 10_740_000
+    assert first["global_capitalization"] == 21_587_400_000
+    assert first["global_capitalization_per"] == pytest.approx(0.11)
+    assert first["update_date"] == date(2025, 10, 17)
+
+    module = scraper("index")
+    df = module.parse(module.CELLS(load("index")), fetcher.UNKNOWN_UPDATE, as_of=datetime(2025, 10, 17))
+    assert list(df["close"]) == pytest.approx([320.11, 158.67, 1110.31])
+
+    module = scraper("volume")
+    doc = load("volume")
+    df = module.parse(module.CELLS(doc), fetcher.last_update_text(doc))
+    assert list(df["traded_value"]) == [1_206_000, 502_350_000, 0]
+    assert df["per"].isna().tolist() == [False, False, True]
+
+
+# Date de mise à jour illisible : la page des volumes échoue au lieu d'écrire une table vide
+def test_volume_requires_update_date():
+    module = scraper("volume")
+    with pytest.raises(ValueError):
+        module.parse(module.CELLS(load("volume")), fetcher.UNKNOWN_UPDATE)
+
+
+# Page reçue en HTTP sans date de mise à jour : repli sur Selenium pour les pages qui l'exigent
+def test_scrape_page_falls_back_without_update_date(monkeypatch):
+    with open(os.path.join(FIXTURES_DIR, "index.html"), encoding="utf-8") as f:
+        html = f.read()
+    module = scraper("volume")
+    monkeypatch.setattr(fetcher, "BACKEND", "http")
+    monkeypatch.setattr(fetcher.cache, "get", lambda url: None)
+    monkeypatch.setattr(fetcher, "fetch_html", lambda url, cached=None, archive=True: html)
+    monkeypatch.setattr(fetcher, "_selenium_page", lambda url, pool, scrape: ("selenium", LAST_UPDATE))
+    assert fetcher.scrape_page(module.URL, None, module.scrape_selenium, extract=module.CELLS,
+                               require_last_update=True) == ("selenium", LAST_UPDATE)
+    cells, last_update_text = fetcher.scrape_page(module.URL, None, module.scrape_selenium, extract=module.CELLS)
+    assert cells and last_update_text == fetcher.UNKNOWN_UPDATE
+
+
+# Valeurs non numériques comptées par colonne dans l'étape en cours
+def test_coercion_failures_counted_in_stage():
+    import pandas as pd
+
+    with metrics.stage("normalize") as stage:
+        values = normalize.to_number(pd.Series(["1\xa0000", "abc", "-", "2,5"]), name="traded_value")
+    assert values.isna().tolist() == [False, True, True, False]
+    assert stage["coercion_failures"] == {"traded_value": 1}